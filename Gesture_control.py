@@ -1,253 +1,601 @@
-import cv2
-import mediapipe as mp
 import tkinter as tk
 from tkinter import ttk
-import serial
+import asyncio
+import inspect
+import json
+import os
+import sys
 import time
-import pyttsx3
 import threading
-import socket
-from PIL import Image, ImageTk
-from queue import Queue
+from types import SimpleNamespace
+from serial_writer import LoopbackTransport, SerialTransport
+from scara_sim import SimulatedArm
+from tcp_control import ControlServer
+from telemetry import Telemetry
+from camera_pipeline import CameraPipeline
+from frame_presenter import FramePresenter
+from gesture_logic import GestureInterpreter, hands_from_results
+from metrics import MetricsRegistry, serve_http
+from playback_engine import speed_scale
+from kinematics import ArmGeometry
+from robots import Robot, RobotRegistry, parse_setall
+from flight_recorder import FlightRecorder
+from state_store import StateStore
+from view_model import ViewModel
+from waypoints import parse_waypoints, waypoints_to_recording
+from path_simplify import summary
+from speech import HIGH, LOW, NORMAL, PhraseCache, Speaker, SpeechQueue
+from startup import Startup
+from hand_tracker import AdaptiveHandTracker
+from inference_worker import InferenceWorker
+
+CONTROL_NAMES = {1: "Servo 1", 2: "Servo 2", 3: "Servo 3", 4: "Servo 4", 5: "Gripper"}
+SPEECH_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "speech_cache")
+# Announcements that are rendered to audio once and then played without synthesis
+FIXED_PHRASES = (
+    [f"Control switched to {name}" for name in CONTROL_NAMES.values()]
+    + [f"Linear Actuator is going {direction}" for direction in ("up", "down")]
+    + [f"Servo 2 moving {direction}" for direction in ("up", "down")]
+    + ["Linear Actuator stopped", "Servo 2 stopped", "Gripper holding", "Gripper releasing",
+       "Recording started", "Recording stopped", "Playback stopped", "No recorded movements to play",
+       "Switched to Hand Gesture Control", "Switched to Manual Control", "Invalid number of loops",
+       "Your SCARA Control Panel is Loading", "Your SCARA robot is initialized."]
+)
+
+speech_queue = SpeechQueue()
+
+SERIAL_PORT = '/dev/ttyUSB0'  # "sim" for the software arm in scara_sim.py, "sim:10" to run it 10x faster
+# Arm id -> serial port. The first arm is the one the GUI, gestures and plain TCP commands drive;
+# the others are addressed over TCP as "@<id> <command>", or all at once with "@all <command>"
+ARMS = {"1": SERIAL_PORT}
+BAUD_RATE = 9600  # Must match SERIAL_BAUD in scara_controller.ino
+SERIAL_ACK_WINDOW = 64  # Bytes sent but not yet echoed by the firmware (its RX buffer); None paces on baud rate only
+SERIAL_READY_TIMEOUT = 2.5  # Opening the port resets the Arduino; wait at most this long for its banner
+USE_BINARY_PROTOCOL = False  # Send compact frames (scara_protocol.py) instead of text lines
+CONTROL_RATE = 20  # Hz, servo targets are flushed at most this often
+TCP_PORT = 12345
+TELEMETRY_RATE = 10  # Hz, default for `subscribe` when the client does not give a rate
+RUN_PROGRESS_INTERVAL = 0.5  # Seconds between "Run NN%" messages while an uploaded trajectory plays
+RENDER_FPS = 30
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+ARM_GEOMETRY = ArmGeometry(base_link=100.0, link3=100.0, link4=50.0, z_min=0.0, z_max=100.0)  # mm, calibrate
+SIMPLIFY_TOLERANCE = 1.0  # Degrees (firmware units) a simplified recording may stray from the original
+LINEAR_SPEED_MM_S = 10.0  # Linear actuator travel speed, used to time z moves
+HAND_MODEL_COMPLEXITY = 0  # MediaPipe Hands model: 0 = lite, 1 = full (slower, slightly more accurate)
+INFERENCE_PROCESS = False  # Run MediaPipe Hands in a worker process (inference_worker.py) so it cannot stall the GUI
+ADAPTIVE_INFERENCE = True  # Downscaled detection, ROI tracking and a lower rate while the hand is still or absent
+FLIGHT_RECORDER_SIZE = 8192  # Last commands kept in memory for `dump` and crash dumps
+FLIGHT_DUMP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "flight_dumps")
+METRICS_HTTP_PORT = None  # e.g. 9100 to serve /metrics (Prometheus text) and /stats on localhost
+
+
+
+def broadcast_servos(robot, changes):
+    # The GUI arm keeps the original message format; other arms are tagged with their id
+    prefix = "" if robot is arm else f"@{robot.id} "
+    for servo, position in changes.items():
+        control_server.broadcast(f"{prefix}S{servo}{max(0, min(180, position))}")
+
+
+def show_joint(robot, command):
+    if robot is arm and command[:2] in ("S1", "S3", "S4"):
+        servo = int(command[1])
+        view.set(("slider", servo), robot.positions[servo])
+
+
+def report_playback_progress(robot, loop, loops):
+    prefix = "" if robot is arm else f"@{robot.id} "
+    control_server.broadcast(f"{prefix}Playback loop {loop}/{loops}")
+
+
+def announce_arm_state(robot):
+    # Clients hear about a change however it was made: GUI, gesture, another client or playback ending
+    prefix = "" if robot is arm else f"@{robot.id} "
+
+    def announce(version, changes):
+        if "gripper" in changes:
+            control_server.broadcast(prefix + ("Gripper holding" if changes["gripper"] == "Hold"
+                                               else "Gripper releasing"))
+        if "recording" in changes:
+            control_server.broadcast(prefix + ("Recording started" if changes["recording"] else "Recording stopped"))
+        if changes.get("playing") is False:
+            control_server.broadcast(prefix + "Playback stopped")
+    return announce
+
+
+# Widget values set from any thread, applied on the Tk main thread once per display tick
+view = ViewModel(RENDER_FPS)
+flight_recorder = FlightRecorder(FLIGHT_RECORDER_SIZE, ARMS)
+
+# Each arm has its own writer thread, servo mailbox and recordings; ports are opened by the startup steps
+robots = RobotRegistry()
+for arm_id in ARMS:
+    arm_recordings = RECORDINGS_DIR if not robots.robots else os.path.join(RECORDINGS_DIR, arm_id)
+    robots.add(Robot(arm_id, arm_recordings, ARM_GEOMETRY, baudrate=BAUD_RATE, control_rate=CONTROL_RATE,
+                     binary=USE_BINARY_PROTOCOL, linear_speed=LINEAR_SPEED_MM_S, on_servos=broadcast_servos,
+                     on_joint=show_joint, on_progress=report_playback_progress, ack_window=SERIAL_ACK_WINDOW,
+                     flight_recorder=flight_recorder, simplify_tolerance=SIMPLIFY_TOLERANCE)).start()
+arm = robots.default
+servo_mailbox = arm.mailbox
+serial_writer = arm.writer
+recording_store = arm.store
+
+metrics = MetricsRegistry()
+metrics.gauge("gui_pending_updates", "Widget values waiting for the next display tick", view.pending_count)
+metrics.counter("gui_updates", "Widget values applied on the main thread", lambda: view.applied)
+metrics.counter("gui_updates_suppressed", "Widget values dropped because nothing changed", lambda: view.suppressed)
+metrics.gauge("speech_queue_depth", "Pending speech phrases", speech_queue.qsize)
+metrics.counter("speech_superseded", "Announcements replaced before being spoken", lambda: speech_queue.superseded)
+metrics.gauge("servo_mailbox_pending", "Servo targets waiting for the next flush", servo_mailbox.pending_count)
+metrics.meter("servo_targets", "Servo targets posted", lambda: servo_mailbox.posted)
+metrics.counter("servo_targets_coalesced", "Servo targets superseded before a flush", lambda: servo_mailbox.coalesced)
+metrics.gauge("serial_queue_depth", "Commands waiting for the serial writer", serial_writer.queue.qsize)
+metrics.meter("serial_commands", "Commands written to the serial port", lambda: serial_writer.commands_sent)
+metrics.meter("serial_bytes", "Bytes written to the serial port", lambda: serial_writer.bytes_sent)
+metrics.counter("serial_dropped", "Commands dropped because the serial queue was full", lambda: serial_writer.dropped)
+if arm.acks:
+    arm.acks.on_rtt = metrics.histogram("serial_rtt_seconds", "Command write to firmware echo",
+                                        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0)).observe
+    metrics.gauge("serial_in_flight_bytes", "Bytes written but not yet answered by the firmware",
+                  lambda: arm.acks.in_flight)
+    metrics.counter("serial_naks", "Binary frames the firmware rejected", lambda: arm.acks.naks)
+    metrics.counter("serial_lost", "Commands the firmware never answered", lambda: arm.acks.lost + arm.acks.timeouts)
+for other_arm in list(robots.robots.values())[1:]:
+    metrics.meter(f"serial_commands_{other_arm.id}", f"Commands written to arm {other_arm.id}",
+                  lambda other_arm=other_arm: other_arm.writer.commands_sent)
+camera_frames = metrics.meter("camera_frames", "Frames through hand inference")
+hand_inference_seconds = metrics.histogram("hand_inference_seconds", "Time spent in hands.process")
+
+# Filled in by the startup steps below; cv2, mediapipe and pyttsx3 are imported there, off the main thread
+cv2 = None
+mp_hands = None
+hands = None
+mp_draw = None
+speaker = None
+
+# Shared with the camera, TCP and GUI threads; each arm's gripper/recording/playback state is in robot.state
+state = StateStore(control=1, gesture_enabled=True, hand_detected=False, left_hand="", left_state="None",
+                   right_state="None")
+current_theme = "dark"
+slider_echo = True  # False while a slider is moved programmatically
 
-# Initialize text-to-speech engine
-engine = pyttsx3.init()
-engine.setProperty('rate', 150)
 
-speech_queue = Queue()
-gui_queue = Queue()
-servo_queue = Queue()
+def dump_flight_recorder(reason="dump"):
+    os.makedirs(FLIGHT_DUMP_DIR, exist_ok=True)
+    path = os.path.join(FLIGHT_DUMP_DIR, f"flight-{time.strftime('%Y%m%d-%H%M%S')}-{reason}.jsonl")
+    count = flight_recorder.dump(path)
+    print(f"Flight recorder: {count} commands written to {path}")
+    return path, count
 
-arduino = serial.Serial('/dev/ttyUSB0', 9600, timeout=1)
-time.sleep(2)
 
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(max_num_hands=1, min_detection_confidence=0.7)
-mp_draw = mp.solutions.drawing_utils
+def dump_on_crash(previous):
+    def hook(*args):
+        try:
+            dump_flight_recorder("crash")
+        except Exception as e:
+            print(f"Flight recorder dump failed: {e}")
+        previous(*args)
+    return hook
 
-current_control = 1
-hand_detected = False
-gripper_state = "Release"
-current_theme = "dark"
-left_hand_state = "Release"
-right_hand_state = "Release"
-hand_gesture_enabled = True
-client_socket = None
-last_slider_update = {1: 0, 3: 0, 4: 0}
-is_recording = False
-recorded_movements = []  # List of (timestamp, command)
-recording_start_time = 0
-is_playing = False
+
+sys.excepthook = dump_on_crash(sys.excepthook)
+threading.excepthook = dump_on_crash(threading.excepthook)
+
+
+def speak(text, key=None, priority=NORMAL):
+    # A keyed announcement replaces any not-yet-spoken one with the same key
+    speech_queue.put(text, priority, key)
+
+
+def init_speech():
+    global speaker
+    import pyttsx3
+    engine = pyttsx3.init()
+    engine.setProperty('rate', 150)
+    speaker = Speaker(engine, speech_queue, PhraseCache(engine, SPEECH_CACHE_DIR, FIXED_PHRASES)).start()
 
 
-def speak(text):
-    speech_queue.put(text)
+def open_transport(port):
+    if port == "sim" or port.startswith("sim:"):
+        return SimulatedArm(BAUD_RATE, float(port[4:]) if port.startswith("sim:") else 1.0)
+    return SerialTransport(port, BAUD_RATE, timeout=0.2)
 
 
-def audio_thread():
-    while True:
-        text = speech_queue.get()
-        if text is None:
+def init_serial(robot, port):
+    try:
+        transport = open_transport(port)
+    except Exception:
+        # Keep the panel usable without the arm attached; commands are discarded
+        robot.attach(LoopbackTransport(BAUD_RATE))
+        raise
+    # Ready as soon as setup() prints "Arduino initialized", instead of a fixed 2 s sleep
+    deadline = time.monotonic() + SERIAL_READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if b"initialized" in transport.readline():
             break
-        engine.say(text)
-        engine.runAndWait()
-        speech_queue.task_done()
+    robot.attach(transport)
 
 
-threading.Thread(target=audio_thread, daemon=True).start()
+def init_hands():
+    global mp_hands, hands, mp_draw
+    import mediapipe as mp
+    mp_hands = mp.solutions.hands
+    options = dict(max_num_hands=1, min_detection_confidence=0.7, model_complexity=HAND_MODEL_COMPLEXITY)
+    if INFERENCE_PROCESS:
+        hands = InferenceWorker((480, 640, 3), options).start()
+        metrics.counter("inference_worker_restarts", "Times the inference worker process was restarted",
+                        lambda: hands.restarts)
+    else:
+        hands = mp_hands.Hands(**options)
+    mp_draw = mp.solutions.drawing_utils
 
 
-def send_to_arduino(command):
-    arduino.write(f"{command}\n".encode())
-    time.sleep(0.05)
-    if is_recording:
-        timestamp = time.time() - recording_start_time
-        recorded_movements.append((timestamp, command))
-        print(f"Recorded: {timestamp}, {command}")
+def init_camera():
+    global cv2
+    import cv2
+    cap = cv2.VideoCapture(0)
+    if not cap.isOpened():
+        raise RuntimeError("Could not open camera")
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
 
 
-def servo_update_thread():
-    global is_recording, recorded_movements, recording_start_time
-    while True:
-        servo, position = servo_queue.get()
-        if servo is None:
-            break
-        position = max(0, min(180, position))
-        current_time = time.time()
-        if current_time - last_slider_update[servo] < 0.2:
-            servo_queue.task_done()
-            continue
-        last_slider_update[servo] = current_time
-        if servo == 1:
-            position_scaled = int((position / 180) * 270)
-            command = f"S1{position_scaled}"
-        elif servo == 3:
-            position_scaled = int((position / 180) * 360)
-            command = f"S3{position_scaled}"
-        elif servo == 4:
-            position_scaled = position
-            command = f"S4{position_scaled}"
-        send_to_arduino(command)
-        if client_socket:
-            try:
-                client_socket.send(f"S{servo}{position}\n".encode())
-                print(f"Sent to client: S{servo}{position}")
-            except Exception as e:
-                print(f"Failed to send to client: {e}")
-        servo_queue.task_done()
-
-
-threading.Thread(target=servo_update_thread, daemon=True).start()
+def init_network():
+    control_server.start()
+    if METRICS_HTTP_PORT:
+        serve_http(metrics, METRICS_HTTP_PORT)
+
+
+# Weights are rough durations in seconds, so the loading bar advances in proportion to real work
+startup = Startup()
+startup.step("speech", init_speech, weight=0.5)
+for arm_id, port in ARMS.items():
+    startup.step(f"serial_{arm_id}", lambda robot=robots.get(arm_id), port=port: init_serial(robot, port), weight=2.0)
+startup.step("hands", init_hands, weight=2.0)
+startup.step("camera", init_camera, weight=1.0)
+startup.step("network", init_network, weight=0.1)
+for step_name in startup.steps:
+    metrics.gauge(f"startup_{step_name}_seconds", f"Time taken by the {step_name} startup step",
+                  lambda step_name=step_name: startup.timings().get(step_name, 0.0))
+
+
+def begin_recording():
+    arm.begin_recording()
+
+
+def end_recording():
+    arm.end_recording()
+
+
+def load_recording(name):
+    arm.load(name)
+
+
+def save_recording(name):
+    arm.save(name)
+
+
+def send_to_arduino(command, source="gui"):
+    arm.send(command, source)
+
+
+def gripper_action(grip, source="gui"):
+    control = state.get("control")
+    print(f"Gripper action called: state={grip}, current_control={control}, is_recording={arm.is_recording}")
+    if control == 5:
+        if grip == "Hold":
+            send_to_arduino("G1", source)
+            print("Gripper set to Hold")
+        elif grip == "Release":
+            send_to_arduino("G0", source)
+            print("Gripper set to Release")
+
+
+def move_linear_actuator(direction, source="gui"):
+    if state.get("control") == 2:
+        speak(f"Linear Actuator is going {direction}", key="linear")
+        command = f"S2{direction}"
+        send_to_arduino(command, source)
+
+
+def stop_linear_actuator(source="gui"):
+    if state.get("control") == 2:
+        speak("Linear Actuator stopped", key="linear")
+        command = "S2stop"
+        send_to_arduino(command, source)
 
 
 def playback_thread(loops, speed):
-    global is_playing, recorded_movements
-    if not recorded_movements:
-        speak("No recorded movements to play")
+    trajectory = arm.trajectory()
+    if trajectory is None:
+        speak("No recorded movements to play", key="playback")
         print("No recorded movements available")
         return
-    is_playing = True
-    speak(f"Playing recorded movements for {loops} loops")
-    print(f"Starting playback: {len(recorded_movements)} steps, {loops} loops, speed {speed}")
-    speed_factor = 2 - (speed / 5)
-    total_duration = recorded_movements[-1][0]
-    for i in range(int(loops)):
-        if not is_playing:
-            break
-        print(f"Loop {i + 1}/{loops}")
-        start_time = time.time()
-        for timestamp, command in recorded_movements:
-            if not is_playing:
-                break
-            elapsed = time.time() - start_time
-            delay = (timestamp * speed_factor) - elapsed
-            if delay > 0:
-                time.sleep(delay)
-            if command.startswith("S1") or command.startswith("S3") or command.startswith("S4"):
-                servo = int(command[1])
-                position = int(command[2:])
-                servo_queue.put((servo, position))
-                gui_queue.put(("set_slider", servo, position))
-            elif command.startswith("S2") or command.startswith("G"):
-                send_to_arduino(command)
-            print(f"Playing: {command} at {timestamp * speed_factor}s")
-        while time.time() - start_time < total_duration * speed_factor:
-            if not is_playing:
-                break
-            time.sleep(0.01)
-    is_playing = False
-    speak("Playback stopped")
+    speak(f"Playing recorded movements for {loops} loops", key="playback")
+    print(f"Starting playback: {len(trajectory.step_ticks)} steps over {trajectory.duration:.1f}s, "
+          f"{loops} loops, speed {speed}")
+    arm.play(trajectory, int(loops), speed_scale(speed))
+    speak("Playback stopped", key="playback")
     print("Playback completed")
 
 
-def tcp_server():
-    global current_control, client_socket, is_recording, recording_start_time, is_playing
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.bind(('0.0.0.0', 12345))
-    server_socket.listen(1)
-    print("TCP Server listening on port 12345...")
+def move_to(x, y, z=None, heading=None):
+    return arm.move_to(x, y, z, heading)
 
-    while True:
-        client_socket, addr = server_socket.accept()
-        print(f"Connected to client: {addr}")
-        try:
-            while True:
-                data = client_socket.recv(1024).decode().strip().lower()
-                if not data:
-                    break
-                print(f"Received: '{data}'")
-
-                control_map = {
-                    "servo 1": 1,
-                    "servo 2": 2,
-                    "servo 3": 3,
-                    "servo 4": 4,
-                    "gripper": 5
-                }
-                control_names = {1: "Servo 1", 2: "Servo 2", 3: "Servo 3", 4: "Servo 4", 5: "Gripper"}
-
-                try:
-                    if data in control_map:
-                        current_control = control_map[data]
-                        gui_queue.put(("update_control", current_control, control_names[current_control]))
-                        speak(f"Control switched to {control_names[current_control]}")
-                        client_socket.send(f"Switched to {control_names[current_control]}\n".encode())
-                    elif data == "up":
-                        current_control = 2
-                        gui_queue.put(("update_control", current_control, control_names[current_control]))
-                        gui_queue.put(("move_linear", "up"))
-                        speak("Servo 2 moving up")
-                        client_socket.send("Servo 2 moving up\n".encode())
-                    elif data == "down":
-                        current_control = 2
-                        gui_queue.put(("update_control", current_control, control_names[current_control]))
-                        gui_queue.put(("move_linear", "down"))
-                        speak("Servo 2 moving down")
-                        client_socket.send("Servo 2 moving down\n".encode())
-                    elif data == "stop":
-                        current_control = 2
-                        gui_queue.put(("update_control", current_control, control_names[current_control]))
-                        gui_queue.put(("stop_linear", None))
-                        speak("Servo 2 stopped")
-                        client_socket.send("Servo 2 stopped\n".encode())
-                    elif data.startswith("s1"):
-                        position = int(data[2:])
-                        gui_queue.put(("set_slider", 1, position))
-                        servo_queue.put((1, position))
-                    elif data.startswith("s3"):
-                        position = int(data[2:])
-                        gui_queue.put(("set_slider", 3, position))
-                        servo_queue.put((3, position))
-                    elif data.startswith("s4"):
-                        position = int(data[2:])
-                        gui_queue.put(("set_slider", 4, position))
-                        servo_queue.put((4, position))
-                    elif data == "grip":
-                        current_control = 5
-                        gui_queue.put(("update_control", current_control, control_names[current_control]))
-                        gui_queue.put(("gripper_action", "Hold"))
-                        speak("Gripper holding")
-                        client_socket.send("Gripper holding\n".encode())
-                    elif data == "release":
-                        current_control = 5
-                        gui_queue.put(("update_control", current_control, control_names[current_control]))
-                        gui_queue.put(("gripper_action", "Release"))
-                        speak("Gripper releasing")
-                        client_socket.send("Gripper releasing\n".encode())
-                    elif data == "record":
-                        is_recording = True
-                        recorded_movements.clear()
-                        recording_start_time = time.time()
-                        speak("Recording started")
-                        client_socket.send("Recording started\n".encode())
-                    elif data == "stop_recording":
-                        is_recording = False
-                        speak("Recording stopped")
-                        client_socket.send("Recording stopped\n".encode())
-                    elif data.startswith("play"):
-                        parts = data.split()
-                        loops = int(parts[1]) if len(parts) > 1 else 1
-                        speed = int(parts[2]) if len(parts) > 2 else 5
-                        threading.Thread(target=playback_thread, args=(loops, speed), daemon=True).start()
-                        client_socket.send(f"Playing for {loops} loops at speed {speed}\n".encode())
-                    elif data == "stop_playback":
-                        is_playing = False
-                        speak("Playback stopped")
-                        client_socket.send("Playback stopped\n".encode())
-                    else:
-                        client_socket.send("Invalid command\n".encode())
-                except Exception as e:
-                    print(f"Error: {e}")
-                    client_socket.send(f"Error: {str(e)}\n".encode())
-        except Exception as e:
-            print(f"TCP Client error: {e}")
-        finally:
-            client_socket.close()
-            client_socket = None
-            print(f"Disconnected from client: {addr}")
+
+def stop_playing():
+    arm.stop_playback()
+
+
+def select_control(control):
+    state.update(control=control)
 
 
-threading.Thread(target=tcp_server, daemon=True).start()
+def tcp_select_control(control):
+    def handler(client, arg):
+        select_control(control)
+        speak(f"Control switched to {CONTROL_NAMES[control]}", key="control")
+        return f"Switched to {CONTROL_NAMES[control]}"
+    return handler
+
+
+def tcp_linear(direction):
+    def handler(client, arg):
+        select_control(2)
+        if direction == "stop":
+            stop_linear_actuator("tcp")
+            message = "Servo 2 stopped"
+        else:
+            move_linear_actuator(direction, "tcp")
+            message = f"Servo 2 moving {direction}"
+        speak(message, key="linear")
+        return message
+    return handler
+
+
+def tcp_servo(servo):
+    def handler(client, arg):
+        position = int(arg)
+        view.set(("slider", servo), position)
+        arm.post(servo, position, "tcp")
+    return handler
+
+
+def tcp_setall(client, arg):
+    positions = parse_setall(arg)
+    for servo, position in positions.items():
+        view.set(("slider", servo), position)
+    arm.post_many(positions, "tcp")
+
+
+async def tcp_upload(client, arg, payload):
+    # upload <bytes> [json|bin [arm ids]], followed by the body; see waypoints.py for the formats
+    parts = arg.split()
+    selected = robots.select(parts[1]) if len(parts) > 1 else [arm]
+
+    def upload():
+        # Parsing and compiling scale with the upload, so they stay off the event loop
+        waypoints = parse_waypoints(payload, parts[0] if parts else "json")
+        recording = waypoints_to_recording(waypoints)
+        return waypoints, [robot.upload(recording) for robot in selected][-1]
+    waypoints, trajectory = await asyncio.get_running_loop().run_in_executor(None, upload)
+    return (f"Uploaded {len(waypoints)} waypoints ({trajectory.duration:.1f}s) "
+            f"to {', '.join(robot.id for robot in selected)}")
+
+
+def tcp_run_arms(selected, arg):
+    # run [loops [speed]]: plays what was uploaded, with progress sent to every client
+    parts = arg.split()
+    loops = int(parts[0]) if len(parts) > 0 else 1
+    speed = int(parts[1]) if len(parts) > 1 else 5
+    missing = [robot.id for robot in selected if robot.uploaded is None]
+    if missing:
+        raise ValueError(f"Nothing uploaded to arm {', '.join(missing)}")
+    threads = robots.play(selected, [robot.uploaded for robot in selected], loops, speed_scale(speed))
+    threading.Thread(target=report_run_progress, args=(selected, threads), daemon=True).start()
+    return f"Running on {', '.join(robot.id for robot in selected)} for {loops} loops at speed {speed}"
+
+
+def report_run_progress(selected, threads):
+    prefix = "" if selected == [arm] else "@" + ",".join(robot.id for robot in selected) + " "
+    while any(thread.is_alive() for thread in threads):
+        next((thread for thread in threads if thread.is_alive()), threads[0]).join(RUN_PROGRESS_INTERVAL)
+        done = min(robot.playback.progress() for robot in selected)
+        control_server.broadcast(f"{prefix}Run {done * 100:.0f}%")
+    stopped = any(robot.playback.stopping for robot in selected)
+    control_server.broadcast(f"{prefix}Run {'stopped' if stopped else 'finished'}")
+
+
+# Handlers whose change announce_arm_state broadcasts to every client (the sender included) reply only when
+# nothing changed, so the sender hears each message once
+def tcp_gripper(grip):
+    def handler(client, arg):
+        select_control(5)
+        before = arm.gripper
+        gripper_action(grip, "tcp")
+        message = "Gripper holding" if grip == "Hold" else "Gripper releasing"
+        speak(message, key="gripper")
+        return None if arm.gripper != before else message
+    return handler
+
+
+def tcp_record(client, arg):
+    restarted = arm.is_recording
+    begin_recording()
+    speak("Recording started", key="recording")
+    return "Recording started" if restarted else None
+
+
+def tcp_stop_recording(client, arg):
+    stopped = arm.is_recording
+    end_recording()
+    speak("Recording stopped", key="recording")
+    return None if stopped else "Recording stopped"
+
+
+def tcp_save(client, arg):
+    save_recording(arg)
+    return f"Saved recording {arg}"
+
+
+def tcp_load(client, arg):
+    load_recording(arg)
+    return f"Loaded recording {arg} ({len(arm.recording)} steps)"
+
+
+def tcp_move(client, arg):
+    # move x y [z [heading]]: millimetres and degrees in the arm's base frame
+    values = [float(value) for value in arg.split()]
+    if len(values) < 2:
+        raise ValueError("Usage: move x y [z [heading]]")
+    x, y = values[:2]
+    z = values[2] if len(values) > 2 else None
+    heading = values[3] if len(values) > 3 else None
+    s1, s3, s4 = move_to(x, y, z, heading)
+    return f"Moving to S1{s1} S3{s3} S4{s4}"
+
+
+async def tcp_simplify(client, arg):
+    # simplify [tolerance]: the simplified take replaces the last take, ready to play or save
+    tolerance = float(arg) if arg else SIMPLIFY_TOLERANCE
+    # Long takes take a while to simplify, so it runs in the executor and the reply follows when it is done
+    report = await asyncio.get_running_loop().run_in_executor(None, arm.optimise, tolerance)
+    return summary(report)
+
+
+def tcp_list(client, arg):
+    return "Recordings: " + ", ".join(recording_store.names())
+
+
+def tcp_play(client, arg):
+    parts = arg.split()
+    loops = int(parts[0]) if len(parts) > 0 else 1
+    speed = int(parts[1]) if len(parts) > 1 else 5
+    threading.Thread(target=playback_thread, args=(loops, speed), daemon=True).start()
+    return f"Playing for {loops} loops at speed {speed}"
+
+
+def tcp_stop_playback(client, arg):
+    # A running playback announces its own stop when its thread finishes
+    playing = arm.is_playing
+    stop_playing()
+    speak("Playback stopped", key="playback")
+    return None if playing else "Playback stopped"
+
+
+async def tcp_play_arms(selected, arg):
+    # play [loops [speed [name]]] on several arms at once; a name plays that recording of the GUI arm on all of them
+    parts = arg.split()
+    loops = int(parts[0]) if len(parts) > 0 else 1
+    speed = int(parts[1]) if len(parts) > 1 else 5
+
+    def compile_all():
+        # Long recordings take a while to compile, so this runs in the executor; playback starts once all are ready
+        shared = arm.store.open(parts[2]) if len(parts) > 2 else None
+        try:
+            return [robot.trajectory(shared) for robot in selected]
+        finally:
+            # Compiled trajectories are copies; keeping the file mapped would stop it being saved over
+            if shared is not None:
+                shared.close()
+    trajectories = await asyncio.get_running_loop().run_in_executor(None, compile_all)
+    missing = [robot.id for robot, trajectory in zip(selected, trajectories) if trajectory is None]
+    if missing:
+        raise ValueError(f"Nothing to play on arm {', '.join(missing)}")
+    robots.play(selected, trajectories, loops, speed_scale(speed))
+    return f"Playing on {', '.join(robot.id for robot in selected)} for {loops} loops at speed {speed}"
+
+
+def tcp_subscribe(client, arg):
+    # subscribe [topic,topic,... [rate]]: no topics means all of them, rate in Hz
+    parts = arg.split()
+    topics = parts[0].split(",") if parts and parts[0] != "all" else None
+    rate = float(parts[1]) if len(parts) > 1 else TELEMETRY_RATE
+    return telemetry.subscribe(client, topics, rate)
+
+
+def tcp_sim(client, arg):
+    # Joint states and firmware counters of every arm running on the simulator
+    simulated = {robot.id: {"state": robot.transport.state(), "stats": robot.transport.stats()}
+                 for robot in robots.robots.values() if isinstance(robot.transport, SimulatedArm)}
+    if not simulated:
+        return "No simulated arms"
+    return json.dumps(simulated)
+
+
+async def tcp_address(client, arg):
+    # "@<id> <command>", "@<id>,<id> <command>" or "@all <command>"
+    target, _, command = arg.partition(" ")
+    command = command.strip()
+    selected = robots.select(target)
+    if command == "play" or command.startswith("play "):
+        return await tcp_play_arms(selected, command[5:])
+    if command == "run" or command.startswith("run "):
+        return tcp_run_arms(selected, command[4:])
+    replies = []
+    for robot in selected:
+        # The GUI arm goes through the normal handlers so the GUI and speech follow along; other arms'
+        # commands run in the executor, since some (simplify) are too slow for the event loop
+        if robot is arm:
+            reply = control_server.dispatch(client, command)
+            if inspect.isawaitable(reply):
+                reply = await reply
+        else:
+            reply = await asyncio.get_running_loop().run_in_executor(None, robot.execute, command)
+        if reply:
+            replies.append(f"@{robot.id} {reply}")
+    return "\n".join(replies) or None
+
+
+control_server = ControlServer(port=TCP_PORT)
+# Sampled on the server's event loop when a subscriber is due an update, never on the arm threads
+telemetry = Telemetry(control_server)
+telemetry.source("joints", lambda: {robot.id: {f"s{servo}": position for servo, position in robot.positions.items()}
+                                    for robot in robots.robots.values()})
+telemetry.source("gripper", lambda: {robot.id: robot.gripper for robot in robots.robots.values()})
+telemetry.source("detection", lambda: {"detected": state.get("hand_detected"), "left": state.get("left_state"),
+                                       "right": state.get("right_state")})
+telemetry.source("progress", lambda: {robot.id: round(robot.playback.progress(), 3) if robot.is_playing else None
+                                      for robot in robots.robots.values()})
+for number in range(1, 5):
+    control_server.command(f"servo {number}", tcp_select_control(number))
+control_server.command("gripper", tcp_select_control(5))
+for direction in ("up", "down", "stop"):
+    control_server.command(direction, tcp_linear(direction))
+for number in (1, 3, 4):
+    control_server.prefix_command(f"s{number}", tcp_servo(number))
+control_server.command("setall", tcp_setall)
+control_server.payload_command("upload", tcp_upload)
+control_server.command("run", lambda client, arg: tcp_run_arms([arm], arg))
+control_server.command("grip", tcp_gripper("Hold"))
+control_server.command("release", tcp_gripper("Release"))
+control_server.command("record", tcp_record)
+control_server.command("stop_recording", tcp_stop_recording)
+control_server.command("save", tcp_save)
+control_server.command("load", tcp_load)
+control_server.command("list", tcp_list)
+control_server.command("simplify", tcp_simplify)
+control_server.command("move", tcp_move)
+control_server.command("play", tcp_play)
+control_server.command("stop_playback", tcp_stop_playback)
+control_server.command("arms", lambda client, arg: "\n".join(robot.status() for robot in robots.robots.values()))
+control_server.prefix_command("@", tcp_address)
+control_server.command("sim", tcp_sim)
+control_server.command("subscribe", tcp_subscribe)
+control_server.command("unsubscribe", lambda client, arg: telemetry.unsubscribe(client))
+metrics.gauge("tcp_clients", "Connected TCP clients", lambda: len(control_server.clients))
+metrics.gauge("telemetry_streams", "Clients subscribed to telemetry", lambda: len(telemetry.streams))
+metrics.meter("telemetry_messages", "Telemetry messages sent", lambda: telemetry.sent)
+metrics.counter("telemetry_skipped", "Telemetry ticks skipped for clients with unsent data", lambda: telemetry.skipped)
+control_server.command("stats", lambda client, arg: metrics.to_json())
+control_server.command("dump", lambda client, arg: "Dumped {1} commands to {0}".format(*dump_flight_recorder()))
+state.subscribe(lambda version, changes: control_server.broadcast(f"Control {CONTROL_NAMES[changes['control']]}"),
+                keys=("control",))
+for robot in robots.robots.values():
+    robot.state.subscribe(announce_arm_state(robot), keys=("gripper", "recording", "playing"))
+startup.start()
 
 
 def show_loading_screen(root):
@@ -279,27 +627,28 @@ def show_loading_screen(root):
         loading_label.configure(fg=color)
         loading_window.after(200, fade_text, step + 1)
 
-    def update_loading_bar(progress=0):
-        nonlocal keep_animating
+    def update_loading_bar(shown=0.0):
         if not loading_window.winfo_exists() or not keep_animating:
             return
-        new_width = (progress / 100) * bar_width
-        loading_canvas.coords(progress_bar, 0, 0, new_width, bar_height)
-        if progress < 100:
-            loading_window.after(30, update_loading_bar, progress + 1)
-
-    fade_text()
-    update_loading_bar()
-    speak("Your SCARA Control Panel is Loading")
+        if startup.done:
+            close_loading()
+            return
+        # Ease towards the fraction of startup work actually finished
+        shown += (startup.progress() - shown) * 0.3
+        loading_canvas.coords(progress_bar, 0, 0, shown * bar_width, bar_height)
+        loading_window.after(30, update_loading_bar, shown)
 
     def close_loading():
         nonlocal keep_animating
         keep_animating = False
+        print(startup.report())
         loading_window.destroy()
         setup_main_gui(root)
         root.deiconify()
 
-    loading_window.after(3000, close_loading)
+    fade_text()
+    update_loading_bar()
+    speak("Your SCARA Control Panel is Loading", key="status", priority=LOW)
 
 
 def setup_main_gui(root):
@@ -337,16 +686,12 @@ def setup_main_gui(root):
                 widget.configure(bg=bg_color)
 
     def toggle_control_mode():
-        global hand_gesture_enabled
-        hand_gesture_enabled = not hand_gesture_enabled
-        mode_text = "Hand Gesture Control" if hand_gesture_enabled else "Manual Control"
-        control_mode_label.config(text=f"Mode: {mode_text}")
-        speak(f"Switched to {mode_text}")
+        enabled = state.modify(lambda current: {"gesture_enabled": not current["gesture_enabled"]})["gesture_enabled"]
+        speak(f"Switched to {'Hand Gesture Control' if enabled else 'Manual Control'}", key="mode")
 
     def set_slider(servo, position):
         global servo1_slider, servo3_slider, servo4_slider
         position = max(0, min(180, position))
-        print(f"Setting slider {servo} to {position}")
         if servo == 1 and servo1_slider:
             servo1_slider.set(position)
         elif servo == 3 and servo3_slider:
@@ -354,38 +699,58 @@ def setup_main_gui(root):
         elif servo == 4 and servo4_slider:
             servo4_slider.set(position)
 
-    def gripper_action(state):
-        global gripper_state
-        print(f"Gripper action called: state={state}, current_control={current_control}, is_recording={is_recording}")
-        if current_control == 5:
-            if state == "Hold":
-                gripper_state = "Hold"
-                send_to_arduino("G1")
-                gripper_label.config(text="Gripper: Hold")
-                print("Gripper set to Hold")
-            elif state == "Release":
-                gripper_state = "Release"
-                send_to_arduino("G0")
-                gripper_label.config(text="Gripper: Release")
-                print("Gripper set to Release")
+    def show_slider(servo, position):
+        # Moves the slider without posting the value back to the servo
+        global slider_echo
+        slider_echo = False
+        try:
+            set_slider(servo, position)
+        finally:
+            slider_echo = True
+
+    def on_slider(servo, value):
+        if slider_echo:
+            view.note(("slider", servo), int(float(value)))
+            arm.post(servo, int(float(value)), "slider")
 
     def start_recording():
-        global is_recording, recorded_movements, recording_start_time
-        is_recording = True
-        recorded_movements.clear()
-        recording_start_time = time.time()
-        speak("Recording started")
+        begin_recording()
+        speak("Recording started", key="recording")
         print("Recording started")
-        if client_socket:
-            client_socket.send("Recording started\n".encode())
 
     def stop_recording():
-        global is_recording
-        is_recording = False
-        speak("Recording stopped")
+        end_recording()
+        speak("Recording stopped", key="recording")
         print("Recording stopped")
-        if client_socket:
-            client_socket.send("Recording stopped\n".encode())
+
+    def refresh_recording_names():
+        recording_name_box.configure(values=recording_store.names())
+
+    def save_named_recording():
+        name = recording_name_box.get().strip().lower()
+        try:
+            save_recording(name)
+            speak(f"Recording saved as {name}", key="recording")
+        except (ValueError, OSError) as e:
+            print(f"Save failed: {e}")
+            speak("Could not save recording", key="recording")
+
+    def load_named_recording():
+        name = recording_name_box.get().strip().lower()
+        try:
+            load_recording(name)
+            speak(f"Recording {name} loaded", key="recording")
+        except (ValueError, OSError) as e:
+            print(f"Load failed: {e}")
+            speak("Could not load recording", key="recording")
+
+    def simplify_recording():
+        try:
+            report = arm.optimise(SIMPLIFY_TOLERANCE)
+            speak(f"Recording simplified, {report['removed']} commands removed", key="recording")
+        except (ValueError, OSError) as e:
+            print(f"Simplify failed: {e}")
+            speak("Could not simplify recording", key="recording")
 
     def play_recording():
         loops = loop_entry.get()
@@ -393,42 +758,14 @@ def setup_main_gui(root):
         try:
             loops = int(loops)
             threading.Thread(target=playback_thread, args=(loops, speed), daemon=True).start()
-            speak(f"Playing for {loops} loops at speed {speed}")
-            if client_socket:
-                client_socket.send(f"Playing for {loops} loops at speed {speed}\n".encode())
+            speak(f"Playing for {loops} loops at speed {speed}", key="playback")
+            control_server.broadcast(f"Playing for {loops} loops at speed {speed}")
         except ValueError:
-            speak("Invalid number of loops")
+            speak("Invalid number of loops", key="loops", priority=HIGH)
 
     def stop_playback():
-        global is_playing
-        is_playing = False
-        speak("Playback stopped")
-        if client_socket:
-            client_socket.send("Playback stopped\n".encode())
-
-    def process_gui_queue():
-        try:
-            while not gui_queue.empty():
-                action, *args = gui_queue.get_nowait()
-                print(f"GUI queue: {action}, {args}")
-                if action == "update_control":
-                    servo_num, name = args
-                    control_button.config(text=f"Switch Control ({name})")
-                elif action == "move_linear":
-                    direction = args[0]
-                    move_linear_actuator(direction)
-                elif action == "stop_linear":
-                    stop_linear_actuator()
-                elif action == "set_slider":
-                    servo, position = args
-                    set_slider(servo, position)
-                elif action == "gripper_action":
-                    state = args[0]
-                    gripper_action(state)
-                gui_queue.task_done()
-        except Exception as e:
-            print(f"GUI queue error: {e}")
-        root.after(100, process_gui_queue)
+        stop_playing()
+        speak("Playback stopped", key="playback")
 
     root.configure(bg="#15202B")
     style = ttk.Style()
@@ -441,6 +778,7 @@ def setup_main_gui(root):
 
     camera_frame = tk.Label(root, bg="#15202B")
     camera_frame.place(x=10, y=10, width=640, height=480)
+    presenter = FramePresenter(root, camera_frame, 640, 480, fps=RENDER_FPS)
 
     global control_frame, servo1_slider, servo3_slider, servo4_slider, left_hand_state_label, right_hand_state_label, control_button, gripper_label, playback_frame, loop_entry, playback_speed
     control_frame = tk.Frame(root, bg="#15202B")
@@ -459,6 +797,16 @@ def setup_main_gui(root):
     record_button.pack(side=tk.LEFT, padx=5)
     stop_record_button = ttk.Button(record_frame, text="Stop Recording", command=stop_recording, style="TButton")
     stop_record_button.pack(side=tk.LEFT, padx=5)
+    recording_name_box = ttk.Combobox(record_frame, width=14, postcommand=refresh_recording_names)
+    recording_name_box.pack(side=tk.LEFT, padx=5)
+    simplify_button = ttk.Button(record_frame, text="Simplify",
+                                 command=lambda: threading.Thread(target=simplify_recording, daemon=True).start(),
+                                 style="TButton")
+    simplify_button.pack(side=tk.LEFT, padx=5)
+    save_record_button = ttk.Button(record_frame, text="Save", command=save_named_recording, style="TButton")
+    save_record_button.pack(side=tk.LEFT, padx=5)
+    load_record_button = ttk.Button(record_frame, text="Load", command=load_named_recording, style="TButton")
+    load_record_button.pack(side=tk.LEFT, padx=5)
 
     play_frame = tk.Frame(playback_frame, bg="#15202B")
     play_frame.pack(pady=5)
@@ -501,7 +849,7 @@ def setup_main_gui(root):
                               style="TButton", width=2)
     servo1_minus.pack(side=tk.LEFT, padx=2)
     servo1_slider = ttk.Scale(servo1_frame, from_=0, to=180, orient=tk.HORIZONTAL,
-                              command=lambda val: servo_queue.put((1, int(float(val)))))
+                              command=lambda val: on_slider(1, val))
     servo1_slider.set(90)
     servo1_slider.pack(side=tk.LEFT, padx=5)
     servo1_plus = ttk.Button(servo1_frame, text="+", command=lambda: set_slider(1, servo1_slider.get() + 2),
@@ -527,7 +875,7 @@ def setup_main_gui(root):
                               style="TButton", width=2)
     servo3_minus.pack(side=tk.LEFT, padx=2)
     servo3_slider = ttk.Scale(servo3_frame, from_=0, to=180, orient=tk.HORIZONTAL,
-                              command=lambda val: servo_queue.put((3, int(float(val)))))
+                              command=lambda val: on_slider(3, val))
     servo3_slider.set(90)
     servo3_slider.pack(side=tk.LEFT, padx=5)
     servo3_plus = ttk.Button(servo3_frame, text="+", command=lambda: set_slider(3, servo3_slider.get() + 5),
@@ -542,7 +890,7 @@ def setup_main_gui(root):
                               style="TButton", width=2)
     servo4_minus.pack(side=tk.LEFT, padx=2)
     servo4_slider = ttk.Scale(servo4_frame, from_=0, to=180, orient=tk.HORIZONTAL,
-                              command=lambda val: servo_queue.put((4, int(float(val)))))
+                              command=lambda val: on_slider(4, val))
     servo4_slider.set(90)
     servo4_slider.pack(side=tk.LEFT, padx=5)
     servo4_plus = ttk.Button(servo4_frame, text="+", command=lambda: set_slider(4, servo4_slider.get() + 5),
@@ -568,161 +916,104 @@ def setup_main_gui(root):
     right_hand_state_label = tk.Label(control_frame, text="Right Hand State: None", bg="#15202B", fg="#FFFFFF")
     right_hand_state_label.pack(pady=5)
 
-    def move_linear_actuator(direction):
-        if current_control == 2:
-            speak(f"Linear Actuator is going {direction}")
-            command = f"S2{direction}"
-            send_to_arduino(command)
-
-    def stop_linear_actuator():
-        if current_control == 2:
-            speak("Linear Actuator stopped")
-            command = "S2stop"
-            send_to_arduino(command)
-
     def switch_control():
-        global current_control
-        current_control = (current_control % 5) + 1
-        control_names = {1: "Servo 1", 2: "Servo 2", 3: "Servo 3", 4: "Servo 4", 5: "Gripper"}
-        control_button.config(text=f"Switch Control ({control_names[current_control]})")
-        speak(f"Control switched to {control_names[current_control]}")
+        control = state.modify(lambda current: {"control": current["control"] % 5 + 1})["control"]
+        speak(f"Control switched to {CONTROL_NAMES[control]}", key="control")
+
+    def set_gesture_servo(servo, value):
+        view.set(("slider", servo), value)
+        arm.post(servo, value, "gesture")
 
     def process_camera():
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            print("Error: Could not open camera.")
+        cap = startup.wait("camera")
+        if cap is None or hands is None:
+            print("Error: Could not start hand tracking, camera or MediaPipe unavailable.")
             return
 
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-
-        global hand_detected, gripper_state, left_hand_state, right_hand_state
-        last_servo2_command = None
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("Error: Failed to capture frame.")
-                break
-
+        gestures = GestureInterpreter(SimpleNamespace(
+            get_control=lambda: state.get("control"),
+            get_gripper=lambda: arm.gripper,
+            switch_control=switch_control,
+            set_servo=set_gesture_servo,
+            move_linear=lambda direction: move_linear_actuator(direction, "gesture"),
+            stop_linear=lambda: stop_linear_actuator("gesture"),
+            set_gripper=lambda grip: gripper_action(grip, "gesture"),
+        ))
+
+        def run_hands(image):
+            with hand_inference_seconds.time():
+                return hands.process(image)
+
+        tracker = AdaptiveHandTracker(run_hands) if ADAPTIVE_INFERENCE else None
+        if tracker:
+            metrics.counter("hand_inference_skipped", "Frames the adaptive tracker did not run inference on",
+                            lambda: tracker.skipped)
+        drawn = None  # Last landmarks, redrawn on frames the tracker skips
+
+        def infer_frame(frame):
+            nonlocal drawn
             frame = cv2.flip(frame, 1)
             frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
-            results = hands.process(frame_rgb)
-            hand_detected = False
-
-            if results.multi_hand_landmarks and hand_gesture_enabled:
-                hand_detected = True
-                for idx, hand_landmarks in enumerate(results.multi_hand_landmarks):
-                    mp_draw.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS,
+            results = tracker.update(frame_rgb) if tracker else run_hands(frame_rgb)
+            camera_frames.mark()
+            if results is not None:
+                gestures.update(hands_from_results(results), state.get("gesture_enabled"))
+                drawn = results if gestures.hand_detected else None
+            if drawn:
+                for hand_landmarks in drawn.multi_hand_landmarks:
+                    # Drawn straight onto the RGB frame, so the colours are given as RGB
+                    mp_draw.draw_landmarks(frame_rgb, hand_landmarks, mp_hands.HAND_CONNECTIONS,
                                            landmark_drawing_spec=mp_draw.DrawingSpec(color=(0, 255, 0), thickness=2,
                                                                                      circle_radius=2),
-                                           connection_drawing_spec=mp_draw.DrawingSpec(color=(255, 0, 0), thickness=2))
-
-                    handedness = results.multi_handedness[idx].classification[0].label
-                    thumb_tip = hand_landmarks.landmark[4]
-                    index_tip = hand_landmarks.landmark[8]
-                    distance = ((thumb_tip.x - index_tip.x) ** 2 + (thumb_tip.y - index_tip.y) ** 2) ** 0.5
-
-                    if handedness == "Left":
-                        left_hand_label.config(text="Left Hand Detected")
-                        if thumb_tip.y < index_tip.y:
-                            if left_hand_state != "Hold":
-                                left_hand_state = "Hold"
-                        else:
-                            if left_hand_state != "Hold":
-                                left_hand_state = "Release"
-                            if left_hand_state == "Hold":
-                                left_hand_state = "Release"
-                                switch_control()
-                        left_hand_state_label.config(text=f"Left Hand State: {left_hand_state}")
-                        right_hand_state_label.config(text="Right Hand State: None")
-                    else:
-                        left_hand_label.config(text="")
-                        left_hand_state = "Release"
-                        left_hand_state_label.config(text="Left Hand State: None")
-
-                        if current_control in [1, 3, 4]:
-                            slider_value = min(max(int(distance * 600), 0), 180)
-                            if current_control == 1:
-                                servo1_slider.set(slider_value)
-                                servo_queue.put((1, slider_value))
-                            elif current_control == 3:
-                                servo3_slider.set(slider_value)
-                                servo_queue.put((3, slider_value))
-                            elif current_control == 4:
-                                servo4_slider.set(slider_value)
-                                servo_queue.put((4, slider_value))
-                            right_hand_state = "Hold" if distance < 0.15 else "Release" if distance > 0.25 else "Intermediate"
-                            right_hand_state_label.config(text=f"Right Hand State: {right_hand_state}")
-                        elif current_control == 2:
-                            if distance < 0.15:
-                                right_hand_state = "Hold"
-                                if last_servo2_command != "up":
-                                    move_linear_actuator("up")
-                                    last_servo2_command = "up"
-                            elif distance > 0.25:
-                                right_hand_state = "Release"
-                                if last_servo2_command != "down":
-                                    move_linear_actuator("down")
-                                    last_servo2_command = "down"
-                            else:
-                                right_hand_state = "Intermediate"
-                                if last_servo2_command not in [None, "stop"]:
-                                    stop_linear_actuator()
-                                    last_servo2_command = "stop"
-                            right_hand_state_label.config(text=f"Right Hand State: {right_hand_state}")
-                        elif current_control == 5:
-                            if thumb_tip.y < index_tip.y:
-                                if gripper_state != "Hold":
-                                    gripper_state = "Hold"
-                                    send_to_arduino("G1")
-                                    gripper_label.config(text="Gripper: Hold")
-                            else:
-                                if gripper_state != "Release":
-                                    gripper_state = "Release"
-                                    send_to_arduino("G0")
-                                    gripper_label.config(text="Gripper: Release")
-                            right_hand_state = "Hold" if thumb_tip.y < index_tip.y else "Release"
-                            right_hand_state_label.config(text=f"Right Hand State: {right_hand_state}")
-
-            else:
-                left_hand_label.config(text="")
-                left_hand_state = "Release"
-                right_hand_state = "None"
-                left_hand_state_label.config(text="Left Hand State: None")
-                right_hand_state_label.config(text="Right Hand State: None")
-                if last_servo2_command != "stop" and hand_gesture_enabled and current_control == 2:
-                    stop_linear_actuator()
-                    last_servo2_command = "stop"
-                hand_detected = False if not results.multi_hand_landmarks else hand_detected
-
-            status_label.config(text=f"Hand Detected: {'Yes' if hand_detected else 'No'}")
-
-            img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            imgtk = ImageTk.PhotoImage(image=img)
-            camera_frame.imgtk = imgtk
-            camera_frame.configure(image=imgtk)
-
-            time.sleep(0.033)
+                                           connection_drawing_spec=mp_draw.DrawingSpec(color=(0, 0, 255), thickness=2))
+
+            # The labels are redrawn only when one of these actually changes
+            state.update(hand_detected=gestures.hand_detected, left_hand=gestures.left_hand_text,
+                         left_state=gestures.left_state_text, right_state=gestures.right_state_text)
+            return frame_rgb
+
+        def render_frame(frame_rgb):
+            presenter.submit(frame_rgb)
 
+        # Gesture latency is bounded by inference alone; stale frames are dropped, not queued
+        pipeline = CameraPipeline(cap, infer_frame, render_frame, render_fps=RENDER_FPS).start()
+        pipeline.join()
+        print(f"Camera pipeline stopped: {pipeline.stats()}")
         cap.release()
 
+    # Every widget another thread can change is bound to a view key; only changed values reach Tk
+    for servo in (1, 3, 4):
+        view.bind(("slider", servo), lambda position, servo=servo: show_slider(servo, position))
+    view.bind("control", lambda control: control_button.config(text=f"Switch Control ({CONTROL_NAMES[control]})"))
+    view.bind("gesture_enabled", lambda enabled: control_mode_label.config(
+        text=f"Mode: {'Hand Gesture Control' if enabled else 'Manual Control'}"))
+    view.bind("gripper", lambda gripper: gripper_label.config(text=f"Gripper: {gripper}"))
+    view.bind("hand_detected", lambda detected: status_label.config(
+        text=f"Hand Detected: {'Yes' if detected else 'No'}"))
+    view.bind("left_hand", lambda text: left_hand_label.config(text=text))
+    view.bind("left_state", lambda text: left_hand_state_label.config(text=f"Left Hand State: {text}"))
+    view.bind("right_state", lambda text: right_hand_state_label.config(text=f"Right Hand State: {text}"))
+    state.subscribe(lambda version, changes: view.update(changes), initial=True)
+    arm.state.subscribe(lambda version, changes: view.update(changes), keys=("gripper",), initial=True)
+    view.attach(root)
     threading.Thread(target=process_camera, daemon=True).start()
-    root.after(100, process_gui_queue)
-    speak("Your SCARA robot is initialized.")
+    speak("Your SCARA robot is initialized.", key="status", priority=LOW)
 
 
 root = tk.Tk()
 root.title("SCARA Robot Control")
 root.geometry("1000x700")
 root.withdraw()
+root.report_callback_exception = dump_on_crash(root.report_callback_exception)
 
 show_loading_screen(root)
 root.mainloop()
 
-speech_queue.put(None)
-servo_queue.put((None, None))
-arduino.close()
-hands.close()
-cv2.destroyAllWindows()
+speech_queue.close()
+control_server.stop()
+robots.close()
+if hands:
+    hands.close()
+if cv2:
+    cv2.destroyAllWindows()
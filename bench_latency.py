@@ -0,0 +1,364 @@
+import argparse
+import contextlib
+import json
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from camera_pipeline import CameraPipeline
+from gesture_logic import GestureInterpreter, Point, hands_from_results
+from hand_tracker import AdaptiveHandTracker
+from playback_engine import PlaybackEngine, Trajectory
+from serial_writer import LoopbackTransport, SerialWriter
+from servo_mailbox import ServoMailbox, servo_command
+from tcp_control import ControlServer
+
+
+class Harness:
+    """The host side of the arm: mailbox -> serial writer -> loopback port, with latency probes."""
+
+    def __init__(self, baud, control_rate):
+        self.marks = {}
+        self.latencies = []
+        self.written = 0
+        self.lock = threading.Lock()
+        self.transport = LoopbackTransport(baud, on_write=self._on_write)
+        self.writer = SerialWriter(self.transport).start()
+        self.mailbox = ServoMailbox(rate=control_rate)
+        self.thread = threading.Thread(target=self.mailbox.run, args=(self._deliver,), daemon=True)
+        self.thread.start()
+
+    def mark(self, command, t=None):
+        # Latency is measured from the first request for a command to its byte leaving the host
+        with self.lock:
+            self.marks.setdefault(command, time.monotonic() if t is None else t)
+
+    def post(self, servo, position, t=None):
+        self.mark(servo_command(servo, position), t)
+        self.mailbox.post(servo, position)
+
+    def _deliver(self, changes):
+        for servo, position in changes.items():
+            self.writer.send(servo_command(servo, position))
+
+    def _on_write(self, data):
+        now = time.monotonic()
+        command = data.decode().strip()
+        with self.lock:
+            self.written += 1
+            started = self.marks.pop(command, None)
+            if started is not None:
+                self.latencies.append(now - started)
+
+    def close(self):
+        self.mailbox.close()
+        self.thread.join(1)
+        self.writer.stop()
+
+
+class FakeCamera:
+    """Produces synthetic right-hand landmarks at a fixed frame rate; each frame carries its capture time."""
+
+    def __init__(self, fps, frames):
+        self.period = 1.0 / fps if fps else 0.0
+        self.frames = frames
+        self.index = 0
+        self.next_frame = time.monotonic()
+
+    def read(self):
+        if self.index >= self.frames:
+            return False, None
+        if self.period:
+            delay = self.next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_frame += self.period
+        self.index += 1
+        return True, (time.monotonic(), self.hands())
+
+    def hands(self):
+        # Sweep the thumb-index distance so consecutive frames map to different slider values
+        distance = 0.02 + (self.index % 150) * 0.002
+        landmarks = [Point(0.5, 0.5, 0.0)] * 21
+        landmarks[8] = Point(0.5 + distance, 0.5, 0.0)
+        return [("Right", landmarks)]
+
+
+class ImageCamera(FakeCamera):
+    """Draws the synthetic hand into 640x480 frames: moving for a third of the run, then still, then out of view.
+
+    Each landmark is a 2x2 block whose grey level is its index + 1, so synthetic_detector can find it again.
+    """
+
+    def hands(self):
+        phase = 3 * (self.index - 1) // self.frames
+        if phase == 2:
+            return []
+        distance = 0.02 + (min(self.index, self.frames // 3) % 50) * 0.006
+        # Thumb tip at the centre, index tip to its right, the other landmarks in a row below
+        landmarks = [Point(0.3 + 0.02 * i, 0.6, 0.0) for i in range(21)]
+        landmarks[4] = Point(0.4, 0.5, 0.0)
+        landmarks[8] = Point(0.4 + distance, 0.5, 0.0)
+        return [("Right", landmarks)]
+
+    def read(self):
+        ok, frame = super().read()
+        if not ok:
+            return ok, frame
+        captured_at, detected = frame
+        image = np.zeros((480, 640), dtype=np.uint8)
+        for _, landmarks in detected:
+            for i, point in enumerate(landmarks):
+                x, y = int(point.x * 320) * 2, int(point.y * 240) * 2
+                image[y:y + 2, x:x + 2] = i + 1
+        return True, (captured_at, image)
+
+
+def synthetic_detector(inference_ms):
+    # Stands in for hands.process: a fixed cost per call, whatever the image size, then finds the drawn landmarks
+    def detect(image):
+        if inference_ms:
+            time.sleep(inference_ms / 1000)
+        detect.calls += 1
+        height, width = image.shape[:2]
+        ys, xs = np.nonzero(image)
+        if not len(xs):
+            return SimpleNamespace(multi_hand_landmarks=None, multi_handedness=None)
+        values = image[ys, xs]
+        landmarks = []
+        for i in range(21):
+            found = values == i + 1
+            x, y = (xs[found].mean() / width, ys[found].mean() / height) if found.any() else (0.5, 0.5)
+            landmarks.append(SimpleNamespace(x=float(x), y=float(y), z=0.0))
+        return SimpleNamespace(multi_hand_landmarks=[SimpleNamespace(landmark=landmarks)],
+                               multi_handedness=[SimpleNamespace(classification=[SimpleNamespace(label="Right")])])
+
+    detect.calls = 0
+    return detect
+
+
+class GestureBenchActions:
+    def __init__(self, harness):
+        self.harness = harness
+        self.captured_at = None
+
+    def get_control(self):
+        return 1
+
+    def get_gripper(self):
+        return "Release"
+
+    def set_servo(self, servo, value):
+        self.harness.post(servo, value, self.captured_at)
+
+    def switch_control(self):
+        pass
+
+    def move_linear(self, direction):
+        pass
+
+    def stop_linear(self):
+        pass
+
+    def set_gripper(self, state):
+        pass
+
+
+def run_gesture(harness, rate, duration, inference_ms):
+    actions = GestureBenchActions(harness)
+    gestures = GestureInterpreter(actions)
+
+    def process(frame):
+        captured_at, detected = frame
+        if inference_ms:
+            time.sleep(inference_ms / 1000)
+        actions.captured_at = captured_at
+        gestures.update(detected)
+
+    frames = int(rate * duration) if rate else int(2000 * duration)
+    pipeline = CameraPipeline(FakeCamera(rate, frames), process, lambda output: None).start()
+    pipeline.join()
+
+
+def run_gesture_frames(harness, rate, duration, inference_ms, adaptive=False):
+    # Real frames through the detector, either on every full frame or via AdaptiveHandTracker
+    actions = GestureBenchActions(harness)
+    gestures = GestureInterpreter(actions)
+    detect = synthetic_detector(inference_ms)
+    tracker = AdaptiveHandTracker(detect) if adaptive else None
+
+    def process(frame):
+        captured_at, image = frame
+        results = tracker.update(image) if tracker else detect(image)
+        if results is not None:
+            actions.captured_at = captured_at
+            gestures.update(hands_from_results(results))
+
+    frames = int(rate * duration) if rate else int(2000 * duration)
+    started = time.monotonic()
+    pipeline = CameraPipeline(ImageCamera(rate, frames), process, lambda output: None).start()
+    pipeline.join()
+    elapsed = time.monotonic() - started
+    return {
+        "inferences": detect.calls,
+        "inference_ms_per_s": detect.calls * inference_ms / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def run_gesture_adaptive(harness, rate, duration, inference_ms):
+    return run_gesture_frames(harness, rate, duration, inference_ms, adaptive=True)
+
+
+def run_slider(harness, rate, duration):
+    # A slider drag: Tk calls the command callback for every intermediate value
+    period = 1.0 / rate if rate else 0.0
+    end = time.monotonic() + duration
+    value = 0
+    while time.monotonic() < end:
+        harness.post(1, value % 181)
+        value += 1
+        if period:
+            time.sleep(period)
+
+
+def run_tcp(harness, rate, duration):
+    server = ControlServer(host="127.0.0.1", port=0)
+    for number in (1, 3, 4):
+        server.prefix_command(f"s{number}", lambda client, arg, n=number: harness.mailbox.post(n, int(arg)))
+    server.start()
+    client = socket.create_connection(("127.0.0.1", server.port))
+    period = 1.0 / rate if rate else 0.0
+    end = time.monotonic() + duration
+    value = 0
+    try:
+        while time.monotonic() < end:
+            position = value % 181
+            harness.mark(servo_command(1, position))
+            client.sendall(f"s1{position}\n".encode())
+            value += 1
+            if period:
+                time.sleep(period)
+    finally:
+        time.sleep(0.2)
+        client.close()
+        server.stop()
+
+
+def run_playback(harness, rate, duration):
+    # A recording with one joint target every 1/rate seconds, compiled and replayed like the app does
+    period = 1.0 / rate if rate else 1.0 / 5000
+    recording = [(i * period, servo_command(1, i % 181)) for i in range(int(duration / period))]
+    trajectory = Trajectory.compile(recording, 1.0 / harness.mailbox.period)
+
+    def send(command):
+        # Latency is counted from the step's scheduled deadline
+        harness.mark(command, engine.deadline)
+        harness.writer.send(command)
+
+    engine = PlaybackEngine(send)
+    engine.play(trajectory, scale=1.0 if rate else 1000.0)
+
+
+PATHS = {
+    # name: (runner, realistic input rate in Hz)
+    "gesture": (run_gesture, 30),
+    "gesture_frames": (run_gesture_frames, 30),
+    "gesture_adaptive": (run_gesture_adaptive, 30),
+    "slider": (run_slider, 60),
+    "tcp": (run_tcp, 50),
+    "playback": (run_playback, 20),
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(name, args, rate):
+    runner = PATHS[name][0]
+    harness = Harness(args.baud, args.control_rate)
+    started = time.monotonic()
+    if name.startswith("gesture"):
+        extra = runner(harness, rate, args.duration, args.inference_ms)
+    else:
+        extra = runner(harness, rate, args.duration)
+    harness.writer.drain(timeout=5)
+    time.sleep(2.0 / args.control_rate)
+    harness.writer.drain(timeout=5)
+    elapsed = time.monotonic() - started
+    harness.close()
+    return harness, elapsed, extra
+
+
+def bench_path(name, args):
+    harness, _, extra = measure(name, args, PATHS[name][1])
+    latencies = sorted(1000 * value for value in harness.latencies)
+    # Saturation: producers push as fast as they can; what reaches the port is the sustained rate
+    saturated, elapsed, _ = measure(name, args, 0)
+    result = {
+        "samples": len(latencies),
+        "input_rate_hz": PATHS[name][1],
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "mean_ms": statistics.fmean(latencies) if latencies else None,
+        "max_rate_cmd_s": saturated.written / elapsed if elapsed > 0 else 0.0,
+    }
+    # Runners may add their own figures, e.g. how much inference work a gesture path did
+    result.update(extra or {})
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Input-to-serial latency benchmark for every command path.")
+    parser.add_argument("--paths", default=",".join(PATHS), help="comma-separated subset of " + ",".join(PATHS))
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per run")
+    parser.add_argument("--baud", type=int, default=9600)
+    parser.add_argument("--control-rate", type=float, default=20.0, help="servo mailbox flush rate in Hz")
+    parser.add_argument("--inference-ms", type=float, default=15.0, help="simulated hands.process time")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {
+            "duration": args.duration,
+            "baud": args.baud,
+            "control_rate": args.control_rate,
+            "inference_ms": args.inference_ms,
+        },
+        "paths": {},
+    }
+    # Keep stdout clean for the report; the server and writer log with print()
+    with contextlib.redirect_stdout(sys.stderr):
+        for name in args.paths.split(","):
+            report["paths"][name] = bench_path(name, args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import random
+import sys
+import time
+
+from scara_protocol import FrameDecoder, encode_pose
+
+
+def text_pose(s1, s3, s4, gripper):
+    return f"S1{s1}\nS3{s3}\nS4{s4}\nG{gripper}\n".encode()
+
+
+def parse_text(data):
+    return data.decode().split()
+
+
+def throughput(fn, poses):
+    start = time.perf_counter()
+    for pose in poses:
+        fn(*pose)
+    return len(poses) / (time.perf_counter() - start)
+
+
+def main(count=100000):
+    rng = random.Random(1)
+    poses = [(rng.randint(0, 270), rng.randint(0, 360), rng.randint(0, 180), rng.randint(0, 1)) for _ in range(count)]
+
+    text_bytes = sum(len(text_pose(*pose)) for pose in poses) / count
+    frame_bytes = len(encode_pose(*poses[0]))
+    print(f"{'':24}{'text':>12}{'binary':>12}")
+    print(f"{'bytes per pose':24}{text_bytes:>12.1f}{frame_bytes:>12}")
+    for baud in (9600, 115200):
+        # 10 bits per byte on an 8N1 link
+        print(f"{f'poses/s @ {baud}':24}{baud / 10 / text_bytes:>12.0f}{baud / 10 / frame_bytes:>12.0f}")
+    print(f"{'encode poses/s':24}{throughput(text_pose, poses):>12.0f}{throughput(encode_pose, poses):>12.0f}")
+
+    text_stream = b"".join(text_pose(*pose) for pose in poses)
+    frame_stream = b"".join(encode_pose(*pose) for pose in poses)
+    start = time.perf_counter()
+    parse_text(text_stream)
+    text_rate = count / (time.perf_counter() - start)
+    start = time.perf_counter()
+    FrameDecoder().feed(frame_stream)
+    frame_rate = count / (time.perf_counter() - start)
+    print(f"{'decode poses/s':24}{text_rate:>12.0f}{frame_rate:>12.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,185 @@
+import threading
+import time
+
+
+class FrameRing:
+    """Keeps only the newest few items; readers always get the latest one."""
+
+    def __init__(self, size=2):
+        self.size = size
+        self._items = [None] * size
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            self._seq += 1
+            self._items[self._seq % self.size] = (self._seq, time.monotonic(), item)
+            self._cond.notify_all()
+
+    def latest(self, after=0, timeout=None):
+        # Returns (seq, timestamp, item) newer than `after`, or None on timeout/close
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > after or self._closed, timeout):
+                return None
+            if self._seq <= after:
+                return None
+            skipped = self._seq - after - 1
+            if after and skipped > 0:
+                self.dropped += skipped
+            return self._items[self._seq % self.size]
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class Stage(threading.Thread):
+    def __init__(self, name):
+        super().__init__(name=name, daemon=True)
+        self.running = True
+        self.count = 0
+        self.busy_time = 0.0
+
+    def stop(self):
+        self.running = False
+
+    def fps(self, elapsed):
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+
+class CaptureStage(Stage):
+    def __init__(self, cap, ring, on_error=None):
+        super().__init__("capture")
+        self.cap = cap
+        self.ring = ring
+        self.on_error = on_error
+
+    def run(self):
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                print("Error: Failed to capture frame.")
+                if self.on_error:
+                    self.on_error()
+                break
+            self.count += 1
+            self.ring.put(frame)
+        self.ring.close()
+
+
+class InferenceStage(Stage):
+    def __init__(self, ring, process, results, max_fps=None):
+        super().__init__("inference")
+        self.ring = ring
+        self.process = process
+        self.results = results
+        self.period = 1.0 / max_fps if max_fps else 0.0
+        self.errors = 0
+
+    def run(self):
+        seq = 0
+        last_error = None
+        while self.running:
+            item = self.ring.latest(seq, timeout=0.5)
+            if item is None:
+                if self.ring.closed:
+                    break
+                continue
+            seq, captured_at, frame = item
+            started = time.monotonic()
+            try:
+                output = self.process(frame)
+                failed = False
+            except Exception as e:
+                # One bad frame must not end the stage; repeats of the same error are only counted
+                self.errors += 1
+                if str(e) != last_error:
+                    print(f"Inference failed: {e}")
+                    last_error = str(e)
+                failed = True
+            finished = time.monotonic()
+            self.busy_time += finished - started
+            if not failed:
+                self.count += 1
+                self.results.put((captured_at, output))
+            if self.period:
+                delay = self.period - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+        self.results.close()
+
+
+class RenderStage(Stage):
+    def __init__(self, results, render, fps=30):
+        super().__init__("render")
+        self.results = results
+        self.render = render
+        self.period = 1.0 / fps
+
+    def run(self):
+        seq = 0
+        next_tick = time.monotonic()
+        while self.running:
+            item = self.results.latest(seq, timeout=0.5)
+            if item is None:
+                if self.results.closed:
+                    break
+                continue
+            seq, _, (_, output) = item
+            started = time.monotonic()
+            self.render(output)
+            self.busy_time += time.monotonic() - started
+            self.count += 1
+            # Render on a fixed tick; anything that arrives in between is superseded
+            next_tick = max(next_tick + self.period, time.monotonic())
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+
+class CameraPipeline:
+    """Capture, inference and render each run on their own thread and only hand over the newest item."""
+
+    def __init__(self, cap, process, render, render_fps=30, max_inference_fps=None, ring_size=2):
+        self.frames = FrameRing(ring_size)
+        self.results = FrameRing(ring_size)
+        self.capture = CaptureStage(cap, self.frames)
+        self.inference = InferenceStage(self.frames, process, self.results, max_inference_fps)
+        self.renderer = RenderStage(self.results, render, render_fps)
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        for stage in (self.capture, self.inference, self.renderer):
+            stage.start()
+        return self
+
+    def stop(self):
+        for stage in (self.capture, self.inference, self.renderer):
+            stage.stop()
+        self.frames.close()
+        self.results.close()
+
+    def join(self, timeout=None):
+        for stage in (self.capture, self.inference, self.renderer):
+            stage.join(timeout)
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        inferred = self.inference.count
+        return {
+            "capture_fps": self.capture.fps(elapsed),
+            "inference_fps": self.inference.fps(elapsed),
+            "render_fps": self.renderer.fps(elapsed),
+            "inference_ms": 1000 * self.inference.busy_time / inferred if inferred else 0.0,
+            "frames_dropped": self.frames.dropped,
+            "inference_errors": self.inference.errors,
+        }
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from serial_writer import LoopbackTransport, PtyTransport
+
+# Where a command came from; stored as its index so an entry is a handful of fixed-size fields
+SOURCES = ("unknown", "gesture", "slider", "gui", "tcp", "playback", "move", "replay")
+MAX_COMMAND = 16  # Text commands and binary frames both fit; longer ones are truncated
+ENTRY = np.dtype([
+    ("time", "f8"),  # time.time() when the bytes were written to the port
+    ("latency", "f4"),  # seconds from the request (post/send) to the write
+    ("source", "u1"),
+    ("arm", "u1"),
+    ("size", "u1"),
+    ("data", "u1", MAX_COMMAND),
+])
+
+
+def source_code(source):
+    return SOURCES.index(source) if source in SOURCES else 0
+
+
+class FlightRecorder:
+    """The last `capacity` commands written to the arms, kept in one preallocated array.
+
+    record() only fills in a row and bumps an index, so it is cheap enough to leave on
+    all the time. dump() writes the entries oldest first as JSON lines; read_dump()
+    and replay() send them again through a serial stand-in.
+    """
+
+    def __init__(self, capacity=8192, arm_ids=()):
+        self.entries = np.zeros(capacity, dtype=ENTRY)
+        self.capacity = capacity
+        self.arm_ids = list(arm_ids)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def arm_code(self, arm_id):
+        if arm_id not in self.arm_ids:
+            self.arm_ids.append(arm_id)
+        return self.arm_ids.index(arm_id)
+
+    def record(self, arm_code, source, data, latency):
+        size = min(len(data), MAX_COMMAND)
+        with self._lock:
+            entry = self.entries[self.count % self.capacity]
+            self.count += 1
+            entry["time"] = time.time()
+            entry["latency"] = latency
+            entry["source"] = source_code(source)
+            entry["arm"] = arm_code
+            entry["size"] = size
+            entry["data"][:size] = np.frombuffer(data[:size], dtype=np.uint8)
+
+    def snapshot(self):
+        # Entries oldest first, copied so recording can carry on while they are written out
+        with self._lock:
+            count = self.count
+            if count <= self.capacity:
+                return self.entries[:count].copy()
+            start = count % self.capacity
+            return np.concatenate((self.entries[start:], self.entries[:start]))
+
+    def dump(self, path):
+        entries = self.snapshot()
+        with open(path + ".tmp", "w") as f:
+            for entry in entries:
+                data = bytes(entry["data"][:entry["size"]])
+                f.write(json.dumps({
+                    "t": round(float(entry["time"]), 6),
+                    "latency_ms": round(float(entry["latency"]) * 1000, 3),
+                    "source": SOURCES[entry["source"]],
+                    "arm": self.arm_ids[entry["arm"]] if entry["arm"] < len(self.arm_ids) else None,
+                    "command": _describe(data),
+                    "hex": data.hex(),
+                }) + "\n")
+        os.replace(path + ".tmp", path)
+        return len(entries)
+
+
+def _describe(data):
+    # Text commands as text, binary frames as hex
+    try:
+        text = data.decode("ascii")
+    except UnicodeDecodeError:
+        return data.hex()
+    return text.strip() if text.strip().isprintable() else data.hex()
+
+
+def read_dump(path, arm=None):
+    # (timestamp, raw bytes) per entry, optionally for one arm only
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if arm is None or entry["arm"] == arm:
+                    yield entry["t"], bytes.fromhex(entry["hex"])
+
+
+def replay(entries, transport, speed=1.0):
+    # Writes the recorded bytes to a transport with the original spacing (speed > 1 is faster)
+    first = None
+    started = time.monotonic()
+    sent = 0
+    for timestamp, data in entries:
+        if first is None:
+            first = timestamp
+        delay = (timestamp - first) / speed - (time.monotonic() - started)
+        if delay > 0:
+            time.sleep(delay)
+        transport.write(data)
+        sent += 1
+    return sent
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a flight recorder dump through a serial stand-in.")
+    parser.add_argument("dump", help="JSON-lines file written by the `dump` TCP command or on a crash")
+    parser.add_argument("--arm", help="only replay this arm's commands")
+    parser.add_argument("--speed", type=float, default=1.0, help="time scale, 2 replays twice as fast")
+    parser.add_argument("--pty", action="store_true", help="write to a pseudo-terminal instead of printing")
+    parser.add_argument("--delay", type=float, default=3.0, help="with --pty, seconds to wait before starting")
+    args = parser.parse_args(argv)
+
+    if args.pty:
+        transport = PtyTransport()
+        print(f"Replaying into {transport.slave_name} in {args.delay:.0f}s")
+        time.sleep(args.delay)
+    else:
+        transport = LoopbackTransport(on_write=lambda data: print(_describe(data)))
+    sent = replay(read_dump(args.dump, args.arm), transport, args.speed)
+    print(f"Replayed {sent} commands")
+    transport.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import threading
+
+from PIL import Image, ImageTk
+
+
+class FramePresenter:
+    """Shows the newest RGB frame in a Tk label, reusing a single PhotoImage."""
+
+    def __init__(self, root, label, width=640, height=480, fps=30):
+        self.root = root
+        self.size = (width, height)
+        self.period = max(1, int(1000 / fps))
+        self.photo = ImageTk.PhotoImage("RGB", self.size)
+        label.configure(image=self.photo)
+        label.imgtk = self.photo
+        self._pending = None
+        self._lock = threading.Lock()
+        self.presented = 0
+        self.superseded = 0
+        self.root.after(self.period, self._tick)
+
+    def submit(self, frame_rgb):
+        # Safe from any thread; the main thread picks it up on the next after() tick
+        with self._lock:
+            if self._pending is not None:
+                self.superseded += 1
+            self._pending = frame_rgb
+
+    def _tick(self):
+        with self._lock:
+            frame, self._pending = self._pending, None
+        if frame is not None:
+            height, width = frame.shape[:2]
+            # frombuffer wraps the array memory; paste copies it straight into the Tk image
+            image = Image.frombuffer("RGB", (width, height), frame, "raw", "RGB", 0, 1)
+            if image.size != self.size:
+                image = image.resize(self.size)
+            self.photo.paste(image)
+            self.presented += 1
+        self.root.after(self.period, self._tick)
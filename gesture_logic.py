@@ -0,0 +1,157 @@
+import json
+from collections import namedtuple
+
+from servo_mailbox import servo_command
+
+THUMB_TIP = 4
+INDEX_TIP = 8
+
+Point = namedtuple("Point", "x y z")
+
+
+def hands_from_results(results):
+    # MediaPipe results -> [(handedness, [Point, ...])], the form GestureInterpreter consumes
+    if not results.multi_hand_landmarks:
+        return []
+    return [
+        (results.multi_handedness[idx].classification[0].label,
+         [Point(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark])
+        for idx, hand_landmarks in enumerate(results.multi_hand_landmarks)
+    ]
+
+
+def hands_to_json(hands):
+    return [{"label": label, "landmarks": [list(point) for point in landmarks]} for label, landmarks in hands]
+
+
+def hands_from_json(data):
+    return [(hand["label"], [Point(*point) for point in hand["landmarks"]]) for hand in data]
+
+
+def read_landmark_dump(path):
+    # One JSON object per line: {"t": seconds, "hands": [{"label": ..., "landmarks": [[x, y, z], ...]}]}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                yield entry.get("t"), hands_from_json(entry["hands"])
+
+
+class GestureInterpreter:
+    """Turns hand landmarks into arm actions.
+
+    `actions` provides get_control(), get_gripper(), switch_control(),
+    set_servo(servo, value), move_linear(direction), stop_linear() and
+    set_gripper(state); the GUI and the headless runner supply their own.
+    """
+
+    def __init__(self, actions):
+        self.actions = actions
+        self.hand_detected = False
+        self.left_hand_text = ""
+        self.left_hand_state = "Release"
+        self.right_hand_state = "Release"
+        self.left_state_text = "None"
+        self.right_state_text = "None"
+        self.last_servo2_command = None
+
+    def update(self, hands, enabled=True):
+        actions = self.actions
+        self.hand_detected = False
+        if hands and enabled:
+            self.hand_detected = True
+            for handedness, landmarks in hands:
+                thumb_tip = landmarks[THUMB_TIP]
+                index_tip = landmarks[INDEX_TIP]
+                distance = ((thumb_tip.x - index_tip.x) ** 2 + (thumb_tip.y - index_tip.y) ** 2) ** 0.5
+
+                if handedness == "Left":
+                    self.left_hand_text = "Left Hand Detected"
+                    if thumb_tip.y < index_tip.y:
+                        self.left_hand_state = "Hold"
+                    elif self.left_hand_state == "Hold":
+                        # Releasing a held left hand cycles the controlled joint
+                        self.left_hand_state = "Release"
+                        actions.switch_control()
+                    else:
+                        self.left_hand_state = "Release"
+                    self.left_state_text = self.left_hand_state
+                    self.right_state_text = "None"
+                    continue
+
+                self.left_hand_text = ""
+                self.left_hand_state = "Release"
+                self.left_state_text = "None"
+                control = actions.get_control()
+                if control in [1, 3, 4]:
+                    actions.set_servo(control, min(max(int(distance * 600), 0), 180))
+                    self.right_hand_state = "Hold" if distance < 0.15 else "Release" if distance > 0.25 else "Intermediate"
+                elif control == 2:
+                    if distance < 0.15:
+                        self.right_hand_state = "Hold"
+                        if self.last_servo2_command != "up":
+                            actions.move_linear("up")
+                            self.last_servo2_command = "up"
+                    elif distance > 0.25:
+                        self.right_hand_state = "Release"
+                        if self.last_servo2_command != "down":
+                            actions.move_linear("down")
+                            self.last_servo2_command = "down"
+                    else:
+                        self.right_hand_state = "Intermediate"
+                        if self.last_servo2_command not in [None, "stop"]:
+                            actions.stop_linear()
+                            self.last_servo2_command = "stop"
+                elif control == 5:
+                    state = "Hold" if thumb_tip.y < index_tip.y else "Release"
+                    if actions.get_gripper() != state:
+                        actions.set_gripper(state)
+                    self.right_hand_state = state
+                self.right_state_text = self.right_hand_state
+        else:
+            self.left_hand_text = ""
+            self.left_hand_state = "Release"
+            self.right_hand_state = "None"
+            self.left_state_text = "None"
+            self.right_state_text = "None"
+            if self.last_servo2_command != "stop" and enabled and actions.get_control() == 2:
+                actions.stop_linear()
+                self.last_servo2_command = "stop"
+
+
+class CommandActions:
+    """Stand-alone actions that keep their own control state and emit serial commands."""
+
+    def __init__(self, emit, control=1):
+        self.emit = emit
+        self.control = control
+        self.gripper_state = "Release"
+        self.last_servo = {}
+
+    def get_control(self):
+        return self.control
+
+    def get_gripper(self):
+        return self.gripper_state
+
+    def switch_control(self):
+        self.control = (self.control % 5) + 1
+
+    def set_servo(self, servo, value):
+        # Repeated targets would be coalesced by the servo mailbox anyway
+        if self.last_servo.get(servo) != value:
+            self.last_servo[servo] = value
+            self.emit(servo_command(servo, value))
+
+    def move_linear(self, direction):
+        if self.control == 2:
+            self.emit(f"S2{direction}")
+
+    def stop_linear(self):
+        if self.control == 2:
+            self.emit("S2stop")
+
+    def set_gripper(self, state):
+        if self.control == 5:
+            self.gripper_state = state
+            self.emit("G1" if state == "Hold" else "G0")
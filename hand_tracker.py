@@ -0,0 +1,106 @@
+import time
+
+import numpy as np
+
+
+class AdaptiveHandTracker:
+    """Decides when and on what part of the frame hands.process runs.
+
+    With no hand in view, detection runs on a downscaled frame at idle_fps. Once a
+    hand is found only a margin around it is processed, every frame while it moves
+    and at static_fps once no landmark moves more than static_threshold. Landmarks
+    are always returned in full-frame normalised coordinates.
+    """
+
+    def __init__(self, process, detect_stride=2, roi_margin=0.35, min_roi=0.25, idle_fps=5.0, static_fps=10.0,
+                 static_threshold=0.003, static_frames=5, clock=time.monotonic):
+        self.process = process
+        self.detect_stride = detect_stride
+        self.roi_margin = roi_margin
+        self.min_roi = min_roi
+        self.idle_fps = idle_fps
+        self.static_fps = static_fps
+        self.static_threshold = static_threshold
+        self.static_frames = static_frames
+        self.clock = clock
+        self.roi = None  # (x0, y0, x1, y1), normalised
+        self.static_count = 0
+        self._previous = None
+        self._next_due = 0.0
+        self.inferences = 0
+        self.roi_inferences = 0
+        self.skipped = 0
+        self.pixels = 0
+
+    @property
+    def state(self):
+        if self.roi is None:
+            return "absent"
+        return "static" if self.static_count >= self.static_frames else "moving"
+
+    def update(self, frame):
+        # Returns MediaPipe-style results, or None when this frame is skipped
+        now = self.clock()
+        if now < self._next_due:
+            self.skipped += 1
+            return None
+        height, width = frame.shape[:2]
+        roi = self.roi
+        if roi is None:
+            # Normalised coordinates are unchanged by striding, so nothing to remap
+            image = frame[::self.detect_stride, ::self.detect_stride]
+        else:
+            left, top = int(roi[0] * width), int(roi[1] * height)
+            right, bottom = int(roi[2] * width), int(roi[3] * height)
+            image = frame[top:bottom, left:right]
+            self.roi_inferences += 1
+        image = np.ascontiguousarray(image)
+        results = self.process(image)
+        self.inferences += 1
+        self.pixels += image.shape[0] * image.shape[1]
+
+        if not results.multi_hand_landmarks:
+            self._previous = None
+            self.static_count = 0
+            if roi is not None:
+                # Lost the hand inside the region: search the whole frame on the next one
+                self.roi = None
+                self._next_due = now
+            else:
+                self._next_due = now + 1.0 / self.idle_fps
+            return results
+
+        if roi is not None:
+            scale_x, scale_y = (right - left) / width, (bottom - top) / height
+            for hand in results.multi_hand_landmarks:
+                for landmark in hand.landmark:
+                    landmark.x = left / width + landmark.x * scale_x
+                    landmark.y = top / height + landmark.y * scale_y
+        points = np.array([(landmark.x, landmark.y) for hand in results.multi_hand_landmarks
+                           for landmark in hand.landmark])
+        if self._previous is not None and self._previous.shape == points.shape \
+                and np.abs(points - self._previous).max() < self.static_threshold:
+            self.static_count += 1
+        else:
+            self.static_count = 0
+        self._previous = points
+        self.roi = self._region(points)
+        self._next_due = now + 1.0 / self.static_fps if self.state == "static" else now
+        return results
+
+    def _region(self, points):
+        low, high = points.min(axis=0), points.max(axis=0)
+        centre = np.clip((low + high) / 2, 0.0, 1.0)
+        size = np.maximum((high - low) * (1 + 2 * self.roi_margin), self.min_roi)
+        low = np.clip(centre - size / 2, 0.0, 1.0)
+        high = np.clip(centre + size / 2, 0.0, 1.0)
+        return float(low[0]), float(low[1]), float(high[0]), float(high[1])
+
+    def stats(self):
+        return {
+            "inferences": self.inferences,
+            "roi_inferences": self.roi_inferences,
+            "skipped": self.skipped,
+            "pixels": self.pixels,
+            "state": self.state,
+        }
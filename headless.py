@@ -0,0 +1,89 @@
+import argparse
+import json
+import sys
+import time
+
+from gesture_logic import CommandActions, GestureInterpreter, hands_from_results, hands_to_json, read_landmark_dump
+
+
+def video_hands(path, dump=None):
+    # Same preprocessing as the live camera loop: mirror, convert, run MediaPipe Hands
+    import cv2
+    import mediapipe as mp
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"Error: Could not open video {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    hands = mp.solutions.hands.Hands(max_num_hands=1, min_detection_confidence=0.7)
+    dump_file = open(dump, "w") if dump else None
+    index = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame_rgb = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
+            detected = hands_from_results(hands.process(frame_rgb))
+            t = index / fps
+            if dump_file:
+                dump_file.write(json.dumps({"t": t, "hands": hands_to_json(detected)}) + "\n")
+            index += 1
+            yield t, detected
+    finally:
+        cap.release()
+        hands.close()
+        if dump_file:
+            dump_file.close()
+
+
+def run(source, control=1, enabled=True):
+    # Runs the gesture logic over (t, hands) pairs as fast as possible
+    commands = []
+    frames = 0
+    t = 0.0
+
+    def emit(command):
+        commands.append({"frame": frames, "t": t, "command": command})
+
+    actions = CommandActions(emit, control)
+    gestures = GestureInterpreter(actions)
+    started = time.perf_counter()
+    for frame_t, detected in source:
+        t = frames if frame_t is None else frame_t
+        gestures.update(detected, enabled)
+        frames += 1
+    elapsed = time.perf_counter() - started
+    stats = {
+        "frames": frames,
+        "seconds": elapsed,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "commands": len(commands),
+        "final_control": actions.control,
+    }
+    return commands, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the SCARA gesture logic without Tk, a camera or an arm.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--video", help="video file to run MediaPipe Hands on")
+    source.add_argument("--landmarks", help="JSON-lines landmark dump to replay")
+    parser.add_argument("--control", type=int, default=1, choices=range(1, 6), help="joint selected at start")
+    parser.add_argument("--commands", help="write the command stream here as JSON lines (default: stdout)")
+    parser.add_argument("--dump", help="with --video, also save the detected landmarks for later replays")
+    args = parser.parse_args(argv)
+
+    hands = video_hands(args.video, args.dump) if args.video else read_landmark_dump(args.landmarks)
+    commands, stats = run(hands, args.control)
+
+    out = open(args.commands, "w") if args.commands else sys.stdout
+    for entry in commands:
+        out.write(json.dumps(entry) + "\n")
+    if out is not sys.stdout:
+        out.close()
+    print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+import json
+import math
+import os
+import struct
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+from queue import Empty, Queue
+from types import SimpleNamespace
+
+import numpy as np
+
+# Parent -> worker on the worker's stdin: sequence number, slot, frame height, width and channels.
+# Worker -> parent on its stdout: sequence number and hand count, then per hand a handedness
+# byte (0 left, 1 right) and 21 x/y/z landmarks as float32. Frames themselves never go
+# through the pipe; they are copied into a shared-memory slot and read in place.
+REQUEST = struct.Struct("<IHHHB")
+RESPONSE = struct.Struct("<IB")
+LANDMARKS = 21
+HAND = struct.Struct(f"<B{LANDMARKS * 3}f")
+READY = b"SCARAHND"
+LABELS = ("Left", "Right")
+
+
+class InferenceWorker:
+    """Runs MediaPipe Hands in a child process and exposes the same process(image) / close() as Hands.
+
+    If the worker dies or stops answering it is restarted in the background: frames come
+    back with no hands until the new worker has loaded its model, so the camera pipeline
+    never waits on a restart.
+    """
+
+    def __init__(self, max_shape=(480, 640, 3), hands_options=None, slots=2, timeout=2.0, start_timeout=30.0,
+                 restart_delay=1.0):
+        self.max_shape = max_shape
+        self.hands_options = hands_options or {}
+        self.slots = slots
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.restart_delay = restart_delay
+        self.slot_bytes = int(np.prod(max_shape))
+        self.memory = shared_memory.SharedMemory(create=True, size=self.slot_bytes * slots)
+        self.process_handle = None
+        self.responses = Queue()
+        self.seq = 0
+        self.restarts = 0
+        self.failures = 0
+        self._next_start = 0.0
+        self._starting_since = None  # Set while a launched worker has not reported ready yet
+        self._closed = False
+
+    def start(self):
+        # Waits for the first worker; if it cannot start, the process and shared memory are released
+        try:
+            self._launch()
+            # The child imports MediaPipe and loads the model before it reports ready
+            if self.responses.get(timeout=self.start_timeout) is None:
+                raise RuntimeError("Inference worker failed to start")
+        except Empty:
+            self.close()
+            raise RuntimeError(f"Inference worker did not start within {self.start_timeout:g}s") from None
+        except BaseException:
+            self.close()
+            raise
+        self._starting_since = None
+        return self
+
+    def _launch(self):
+        # Launched as a plain script, not via multiprocessing, so the child never re-imports the GUI module
+        self.process_handle = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), self.memory.name, json.dumps(list(self.max_shape)),
+             json.dumps(self.hands_options)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.responses = Queue()
+        self._starting_since = time.monotonic()
+        threading.Thread(target=self._read_responses, args=(self.process_handle, self.responses),
+                         daemon=True).start()
+
+    def _read_responses(self, handle, responses):
+        stream = handle.stdout
+        try:
+            if _read_exact(stream, len(READY)) != READY:
+                responses.put(None)
+                return
+            responses.put(READY)
+            while True:
+                seq, count = RESPONSE.unpack(_read_exact(stream, RESPONSE.size))
+                hands = [HAND.unpack(_read_exact(stream, HAND.size)) for _ in range(count)]
+                responses.put((seq, hands))
+        except (EOFError, OSError, struct.error):
+            responses.put(None)
+
+    def process(self, image):
+        if self._closed:
+            raise RuntimeError("Inference worker is closed")
+        if image.dtype != np.uint8 or (image.ndim == 3 and image.shape[2] > self.max_shape[2]):
+            raise ValueError(f"Frames must be uint8 with at most {self.max_shape[2]} channels")
+        if image.shape[0] > self.max_shape[0] or image.shape[1] > self.max_shape[1]:
+            # The camera gave more than it was asked for; landmarks are normalised, so a subsampled frame does
+            step = math.ceil(max(image.shape[0] / self.max_shape[0], image.shape[1] / self.max_shape[1]))
+            image = np.ascontiguousarray(image[::step, ::step])
+        if not self._ready():
+            return results_from_hands([])
+        self.seq += 1
+        slot = self.seq % self.slots
+        height, width = image.shape[:2]
+        channels = image.shape[2] if image.ndim == 3 else 1
+        view = np.ndarray(image.shape, dtype=np.uint8, buffer=self.memory.buf, offset=slot * self.slot_bytes)
+        np.copyto(view, image)
+        try:
+            self.process_handle.stdin.write(REQUEST.pack(self.seq & 0xFFFFFFFF, slot, height, width, channels))
+            self.process_handle.stdin.flush()
+        except OSError:
+            self._fail("worker pipe closed")
+            return results_from_hands([])
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                response = self.responses.get(timeout=max(0.0, deadline - time.monotonic()))
+            except Empty:
+                self._fail("worker timed out")
+                return results_from_hands([])
+            if response is None:
+                self._fail("worker exited")
+                return results_from_hands([])
+            seq, hands = response
+            # Answers to frames abandoned after an earlier timeout are discarded
+            if seq == self.seq & 0xFFFFFFFF:
+                return results_from_hands(hands)
+
+    def _alive(self):
+        return self.process_handle is not None and self.process_handle.poll() is None
+
+    def _ready(self):
+        # Never blocks: checks on a worker that is still starting, or launches one once the back-off is over
+        if self._starting_since is not None:
+            try:
+                response = self.responses.get_nowait()
+            except Empty:
+                if time.monotonic() - self._starting_since > self.start_timeout:
+                    self.process_handle.kill()
+                    self._fail("worker did not start")
+                return False
+            self._starting_since = None
+            if response is None:
+                self._fail("worker failed to start")
+                return False
+        if self._alive():
+            return True
+        if self.process_handle is not None:
+            self._fail("worker exited")
+        if time.monotonic() >= self._next_start:
+            self._restart()
+        return False
+
+    def _fail(self, reason):
+        self.failures += 1
+        print(f"Inference worker failed ({reason}), restarting")
+        self._stop_process()
+        self._next_start = time.monotonic() + self.restart_delay
+
+    def _restart(self):
+        self.restarts += 1
+        try:
+            self._launch()
+        except OSError as e:
+            print(f"Inference worker restart failed: {e}")
+            self._stop_process()
+            self._next_start = time.monotonic() + self.restart_delay
+
+    def _stop_process(self):
+        self._starting_since = None
+        handle, self.process_handle = self.process_handle, None
+        if handle is None:
+            return
+        try:
+            handle.stdin.close()
+            handle.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            handle.kill()
+            handle.wait()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._stop_process()
+        self.memory.close()
+        self.memory.unlink()
+
+
+def results_from_hands(hands):
+    # Compact (label, x, y, z, ...) tuples -> a MediaPipe-shaped results object the drawing utils accept
+    if not hands:
+        return SimpleNamespace(multi_hand_landmarks=None, multi_handedness=None)
+    from mediapipe.framework.formats import landmark_pb2
+    landmark_lists = []
+    handedness = []
+    for hand in hands:
+        values = hand[1:]
+        landmark_lists.append(landmark_pb2.NormalizedLandmarkList(landmark=[
+            landmark_pb2.NormalizedLandmark(x=values[i], y=values[i + 1], z=values[i + 2])
+            for i in range(0, len(values), 3)
+        ]))
+        handedness.append(SimpleNamespace(classification=[SimpleNamespace(label=LABELS[hand[0]])]))
+    return SimpleNamespace(multi_hand_landmarks=landmark_lists, multi_handedness=handedness)
+
+
+def _read_exact(stream, size):
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError("stream closed")
+        data += chunk
+    return data
+
+
+def worker_main(memory_name, max_shape, hands_options):
+    # Keep the binary protocol on the real stdout and send everything else (prints, native logs) to stderr
+    out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    requests = sys.stdin.buffer
+
+    import mediapipe as mp
+    memory = shared_memory.SharedMemory(name=memory_name)
+    try:
+        # The parent owns the segment; stop this process's resource tracker unlinking it on exit
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(memory._name, "shared_memory")
+    except (ImportError, AttributeError, KeyError):
+        pass
+    slot_bytes = int(np.prod(max_shape))
+    hands = mp.solutions.hands.Hands(**hands_options)
+    out.write(READY)
+    out.flush()
+    try:
+        while True:
+            try:
+                seq, slot, height, width, channels = REQUEST.unpack(_read_exact(requests, REQUEST.size))
+            except EOFError:
+                break
+            shape = (height, width, channels) if channels > 1 else (height, width)
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=memory.buf, offset=slot * slot_bytes)
+            try:
+                results = hands.process(frame)
+                detected = results.multi_hand_landmarks or []
+            except Exception as e:
+                print(f"Inference error: {e}", file=sys.stderr)
+                detected = []
+            out.write(RESPONSE.pack(seq, len(detected)))
+            for index, hand_landmarks in enumerate(detected):
+                label = results.multi_handedness[index].classification[0].label
+                values = [value for lm in hand_landmarks.landmark for value in (lm.x, lm.y, lm.z)]
+                out.write(HAND.pack(LABELS.index(label), *values))
+            out.flush()
+    finally:
+        hands.close()
+        memory.close()
+
+
+if __name__ == "__main__":
+    worker_main(sys.argv[1], tuple(json.loads(sys.argv[2])), json.loads(sys.argv[3]))
@@ -0,0 +1,142 @@
+from collections import OrderedDict
+
+import numpy as np
+
+# Servo angles are in firmware degrees (what S1/S3/S4 carry). Joint angles are
+# measured from the servo's centre: base 0-270 -> +-135, link 3 0-360 -> +-180,
+# link 4 0-180 -> +-90. Link 4 at 90 is straight in line with link 3.
+SERVO_LIMITS = {1: (0, 270), 3: (0, 360), 4: (0, 180)}
+SERVO_CENTRES = {1: 135.0, 3: 180.0, 4: 90.0}
+
+
+class ArmGeometry:
+    """Link lengths and actuator travel in millimetres; measure these on the actual arm."""
+
+    def __init__(self, base_link=100.0, link3=100.0, link4=50.0, z_min=0.0, z_max=100.0):
+        self.base_link = base_link
+        self.link3 = link3
+        self.link4 = link4
+        self.z_min = z_min
+        self.z_max = z_max
+
+    @property
+    def reach(self):
+        return self.base_link + self.link3 + self.link4
+
+
+def _wrap(degrees):
+    return (degrees + 180.0) % 360.0 - 180.0
+
+
+def forward(geometry, s1, s3, s4):
+    """Servo angles (arrays) -> tool x, y and heading in degrees."""
+    q1 = np.radians(np.asarray(s1, dtype=float) - SERVO_CENTRES[1])
+    q3 = np.radians(np.asarray(s3, dtype=float) - SERVO_CENTRES[3])
+    q4 = np.radians(np.asarray(s4, dtype=float) - SERVO_CENTRES[4])
+    a13 = q1 + q3
+    heading = a13 + q4
+    x = geometry.base_link * np.cos(q1) + geometry.link3 * np.cos(a13) + geometry.link4 * np.cos(heading)
+    y = geometry.base_link * np.sin(q1) + geometry.link3 * np.sin(a13) + geometry.link4 * np.sin(heading)
+    return x, y, _wrap(np.degrees(heading))
+
+
+def inverse(geometry, x, y, heading=None):
+    """Tool targets (arrays) -> servo angles s1, s3, s4 and a reachable mask.
+
+    With no heading, link 4 is held straight and the tool is solved as a two-link arm.
+    Of the two elbow solutions the first one inside every servo limit is used.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    a = geometry.base_link
+    if heading is None:
+        b = geometry.link3 + geometry.link4
+        wx, wy = x, y
+    else:
+        b = geometry.link3
+        phi = np.radians(np.asarray(heading, dtype=float))
+        wx = x - geometry.link4 * np.cos(phi)
+        wy = y - geometry.link4 * np.sin(phi)
+
+    cos_q3 = (wx ** 2 + wy ** 2 - a ** 2 - b ** 2) / (2 * a * b)
+    reachable = np.abs(cos_q3) <= 1.0
+    cos_q3 = np.clip(cos_q3, -1.0, 1.0)
+
+    best = None
+    for sign in (1.0, -1.0):
+        q3 = sign * np.arccos(cos_q3)
+        q1 = np.arctan2(wy, wx) - np.arctan2(b * np.sin(q3), a + b * np.cos(q3))
+        q4 = np.zeros_like(q1) if heading is None else phi - q1 - q3
+        s1 = _wrap(np.degrees(q1)) + SERVO_CENTRES[1]
+        s3 = _wrap(np.degrees(q3)) + SERVO_CENTRES[3]
+        s4 = _wrap(np.degrees(q4)) + SERVO_CENTRES[4]
+        valid = reachable.copy()
+        for servo, values in ((1, s1), (3, s3), (4, s4)):
+            low, high = SERVO_LIMITS[servo]
+            valid &= (values >= low) & (values <= high)
+        if best is None:
+            best = [s1, s3, s4, valid]
+        else:
+            # Fill in targets the first elbow configuration could not reach
+            use = valid & ~best[3]
+            for i, values in enumerate((s1, s3, s4)):
+                best[i] = np.where(use, values, best[i])
+            best[3] = best[3] | valid
+    return best[0], best[1], best[2], best[3]
+
+
+def clamp_z(geometry, z):
+    return np.clip(np.asarray(z, dtype=float), geometry.z_min, geometry.z_max)
+
+
+class IKCache:
+    """LRU cache of inverse solutions keyed on targets snapped to a grid of `resolution` mm/degrees."""
+
+    def __init__(self, geometry, resolution=0.5, maxsize=4096):
+        self.geometry = geometry
+        self.resolution = resolution
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, x, y, heading):
+        r = self.resolution
+        return (round(x / r), round(y / r), None if heading is None else round(heading / r))
+
+    def solve(self, x, y, heading=None):
+        # Returns (s1, s3, s4) as ints, or None when the target is out of reach
+        return self.solve_many([(x, y, heading)])[0]
+
+    def solve_many(self, targets):
+        results = [None] * len(targets)
+        misses = {}
+        for i, (x, y, heading) in enumerate(targets):
+            key = self._key(x, y, heading)
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                results[i] = self._cache[key]
+                self.hits += 1
+            else:
+                misses.setdefault(key, []).append(i)
+        if misses:
+            self.misses += len(misses)
+            # Solve every missing key in one vectorised call per heading mode
+            for with_heading in (False, True):
+                keys = [key for key in misses if (key[2] is not None) == with_heading]
+                if not keys:
+                    continue
+                grid = np.array([key[:2] for key in keys], dtype=float) * self.resolution
+                headings = np.array([key[2] for key in keys], dtype=float) * self.resolution if with_heading else None
+                s1, s3, s4, valid = inverse(self.geometry, grid[:, 0], grid[:, 1], headings)
+                for j, key in enumerate(keys):
+                    solution = (int(round(s1[j])), int(round(s3[j])), int(round(s4[j]))) if valid[j] else None
+                    self._store(key, solution)
+                    for i in misses[key]:
+                        results[i] = solution
+        return results
+
+    def _store(self, key, solution):
+        self._cache[key] = solution
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
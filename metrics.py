@@ -0,0 +1,213 @@
+import bisect
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _family(name, kind, help, samples):
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}"] + samples
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, fn=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def read(self):
+        return self.fn() if self.fn else self.value
+
+    def snapshot(self):
+        return self.read()
+
+    def render(self):
+        return _family(self.name, self.kind, self.help, [f"{self.name} {self.read()}"])
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value):
+        self.value = value
+
+
+class Meter(Counter):
+    """A counter that also reports its rate per second between reads."""
+
+    def __init__(self, name, help, fn=None):
+        super().__init__(name, help, fn)
+        self._last_read = (time.monotonic(), 0)
+        self._rate = 0.0
+
+    def mark(self, amount=1):
+        self.value += amount
+
+    def rate(self):
+        now, total = time.monotonic(), self.read()
+        last_time, last_total = self._last_read
+        if now - last_time >= 0.5:
+            self._rate = (total - last_total) / (now - last_time)
+            self._last_read = (now, total)
+        return self._rate
+
+    def snapshot(self):
+        return {"total": self.read(), "per_second": round(self.rate(), 3)}
+
+    def render(self):
+        # The running total is a counter, but the rate goes up and down, so it is a gauge family of its own
+        return (_family(f"{self.name}_total", "counter", self.help, [f"{self.name}_total {self.read()}"])
+                + _family(f"{self.name}_per_second", "gauge", f"{self.help} (per second)",
+                          [f"{self.name}_per_second {self.rate():.3f}"]))
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def time(self):
+        return _Timer(self)
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        with self._lock:
+            counts, count = list(self.counts), self.count
+        if not count:
+            return 0.0
+        target = q * count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets + (self.max,), counts):
+            seen += bucket_count
+            if seen >= target:
+                return bound
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": self.max,
+        }
+
+    def render(self):
+        lines = []
+        cumulative = 0
+        with self._lock:
+            counts, count, total = list(self.counts), self.count, self.sum
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {count}")
+        return _family(self.name, self.kind, self.help, lines)
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class MetricsRegistry:
+    def __init__(self, prefix="scara_"):
+        self.prefix = prefix
+        self.metrics = {}
+        # Metrics are registered from several threads (some lazily) while stats and /metrics read them
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        metric.name = self.prefix + metric.name
+        with self._lock:
+            self.metrics[metric.name] = metric
+        return metric
+
+    def _registered(self):
+        with self._lock:
+            return list(self.metrics.values())
+
+    def counter(self, name, help, fn=None):
+        return self._add(Counter(name, help, fn))
+
+    def gauge(self, name, help, fn=None):
+        return self._add(Gauge(name, help, fn))
+
+    def meter(self, name, help, fn=None):
+        return self._add(Meter(name, help, fn))
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, buckets))
+
+    def snapshot(self):
+        return {metric.name[len(self.prefix):]: metric.snapshot() for metric in self._registered()}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), separators=(",", ":"))
+
+    def render_prometheus(self):
+        lines = []
+        for metric in self._registered():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def serve_http(registry, port, host="127.0.0.1"):
+    # GET /metrics -> Prometheus text format, GET /stats -> the same JSON as the TCP `stats` command
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = registry.render_prometheus(), "text/plain; version=0.0.4"
+            elif self.path == "/stats":
+                body, content_type = registry.to_json(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics endpoint on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,133 @@
+import numpy as np
+
+from playback_engine import UNSET, Trajectory
+
+JOINT_COMMANDS = ("S1", "S3", "S4")
+
+
+def rdp(points, tolerance):
+    """Indices of the (t, angle) points to keep so that straight lines between them pass
+    within `tolerance` of every dropped point.
+
+    The error is measured in angle at the dropped point's time, since that is what
+    playback's linear interpolation reproduces.
+    """
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        t0, v0 = points[first]
+        t1, v1 = points[last]
+        worst, worst_index = -1.0, None
+        for index in range(first + 1, last):
+            t, v = points[index]
+            expected = v0 + (v1 - v0) * (t - t0) / (t1 - t0) if t1 > t0 else v0
+            if abs(v - expected) > worst:
+                worst, worst_index = abs(v - expected), index
+        if worst_index is not None and worst > tolerance:
+            keep[worst_index] = True
+            stack.append((first, worst_index))
+            stack.append((worst_index, last))
+    return [index for index, kept in enumerate(keep) if kept]
+
+
+def _dedupe(points):
+    # A later target at the same instant wins, and only the ends of a run of equal angles matter
+    points = [point for point, following in zip(points, points[1:] + [None])
+              if following is None or following[0] != point[0]]
+    return [point for index, point in enumerate(points)
+            if index in (0, len(points) - 1) or not points[index - 1][1] == point[1] == points[index + 1][1]]
+
+
+def _shift_error(points, index, timestamp):
+    # How far the polyline moves if points[index] is moved earlier to timestamp
+    t, v = points[index]
+    error = 0.0
+    if index > 0:
+        tp, vp = points[index - 1]
+        if t > tp:
+            error = abs(v - (vp + (v - vp) * (timestamp - tp) / (t - tp)))
+    if index + 1 < len(points):
+        tn, vn = points[index + 1]
+        error = max(error, abs((vn - v) * (t - timestamp) / (tn - timestamp)))
+    return error
+
+
+def optimise_recording(recording, tolerance=1.0, merge_window=0.05, rate=20.0):
+    """Returns (movements, report) for a shorter recording that plays back within `tolerance`.
+
+    Joint angles get duplicate removal and RDP simplification per joint; joint updates
+    less than `merge_window` apart are then moved onto one timestamp so they go out in
+    the same control step. Repeated linear actuator and gripper commands are dropped.
+    The report's max_deviation compares both recordings as playback would resample them.
+    """
+    joints = {}
+    events = []
+    for timestamp, command in recording:
+        if command[:2] in JOINT_COMMANDS:
+            joints.setdefault(int(command[1]), []).append((timestamp, int(command[2:])))
+        elif not events or events[-1][1] != command:
+            events.append((timestamp, command))
+    original = len(recording)
+
+    # Half the tolerance goes to simplification and half to moving updates in time
+    kept = {}
+    duplicates = original - len(events) - sum(len(points) for points in joints.values())
+    simplified = 0
+    for joint, points in joints.items():
+        deduped = _dedupe(points)
+        duplicates += len(points) - len(deduped)
+        indices = rdp(deduped, tolerance / 2)
+        simplified += len(deduped) - len(indices)
+        kept[joint] = [list(deduped[index]) for index in indices]
+
+    # Group nearby updates of different joints and move each onto the time of its group's first member
+    order = sorted((points[index][0], joint, index) for joint, points in kept.items() for index in range(len(points)))
+    merged = 0
+    group_start, group_joints = None, set()
+    for timestamp, joint, index in order:
+        if group_start is None or timestamp - group_start > merge_window or joint in group_joints:
+            group_start, group_joints = timestamp, set()
+        elif _shift_error(kept[joint], index, group_start) <= tolerance / 2:
+            kept[joint][index][0] = group_start
+            merged += 1
+        else:
+            continue
+        group_joints.add(joint)
+    movements = [(t, f"S{joint}{angle}") for joint, points in kept.items() for t, angle in points]
+    movements.extend(events)
+    movements.sort(key=lambda movement: movement[0])
+
+    report = {
+        "original": original,
+        "kept": len(movements),
+        "removed": original - len(movements),
+        "duplicates": duplicates,
+        "simplified": simplified,
+        "merged": merged,
+        "max_deviation": max_deviation(recording, movements, rate),
+    }
+    return movements, report
+
+
+def summary(report):
+    return (f"Removed {report['removed']} of {report['original']} commands ({report['duplicates']} duplicates, "
+            f"{report['simplified']} simplified, {report['merged']} merged), "
+            f"max deviation {report['max_deviation']} degrees")
+
+
+def max_deviation(before, after, rate=20.0):
+    # Largest joint angle difference between the two recordings on playback's control-rate grid
+    before, after = Trajectory.compile(before, rate), Trajectory.compile(after, rate)
+    worst = 0
+    for joint, values in before.joints.items():
+        other = after.joints.get(joint)
+        if other is None:
+            continue
+        length = min(len(values), len(other))
+        values, other = values[:length].astype(np.int32), other[:length].astype(np.int32)
+        both = (values != UNSET) & (other != UNSET)
+        if both.any():
+            worst = max(worst, int(np.abs(values - other)[both].max()))
+    return worst
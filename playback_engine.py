@@ -0,0 +1,154 @@
+import threading
+import time
+
+import numpy as np
+
+from recording_store import RECORD_DTYPE, pack_command, unpack_command
+
+POSITION_JOINTS = (1, 3, 4)
+UNSET = -1
+
+
+def speed_scale(speed):
+    # Playback speed 0-10 from the GUI/app: 5 is real time, each 5 steps doubles or halves it
+    return 2.0 ** ((float(speed) - 5.0) / 5.0)
+
+
+class Trajectory:
+    """A recording resampled onto a fixed control-rate grid.
+
+    Each position joint is an int16 column with one target per tick (UNSET before its
+    first one); step_ticks lists the ticks where a joint changes or an event fires. The
+    command strings are only made as playback reaches each step.
+    """
+
+    def __init__(self, rate, ticks, joints, events):
+        self.rate = rate
+        self.ticks = ticks
+        self.joints = joints
+        self.events = events  # tick -> commands other than joint angles (gripper, linear actuator)
+        changed = np.zeros(ticks, dtype=bool)
+        for values in joints.values():
+            previous = np.concatenate(([UNSET], values[:-1]))
+            changed |= (values != UNSET) & (values != previous)
+        changed[list(events)] = True
+        self.step_ticks = np.flatnonzero(changed).astype(np.int32)
+
+    @property
+    def duration(self):
+        return self.ticks / self.rate
+
+    @classmethod
+    def compile(cls, recording, rate=20.0):
+        # A memory-mapped Recording is read in place through raw(); a list of (timestamp, command) is packed first
+        if hasattr(recording, "raw"):
+            records = np.frombuffer(recording.raw(), dtype=RECORD_DTYPE)
+        else:
+            records = np.array([(timestamp,) + pack_command(command) for timestamp, command in recording],
+                               dtype=RECORD_DTYPE)
+        # Copied out so nothing keeps the recording's map exported once this returns
+        times = records["timestamp"].astype(np.float64)
+        kinds = records["kind"].copy()
+        joint_ids = records["joint"].copy()
+        values = records["value"].astype(np.float64)
+        del records
+        ticks = int(round(max(0.0, times.max()) * rate)) + 1 if len(times) else 1
+        is_joint = (kinds == ord("S")) & np.isin(joint_ids, POSITION_JOINTS)
+        joints = {}
+        for joint in POSITION_JOINTS:
+            selected = is_joint & (joint_ids == joint)
+            if selected.any():
+                joints[joint] = cls._resample(times[selected], values[selected], ticks, rate)
+        events = {}
+        for index in np.flatnonzero(~is_joint):
+            command = unpack_command(int(kinds[index]), int(joint_ids[index]), int(values[index]))
+            events.setdefault(int(round(times[index] * rate)), []).append(command)
+        return cls(rate, ticks, joints, {tick: tuple(commands) for tick, commands in events.items()})
+
+    @staticmethod
+    def _resample(times, values, ticks, rate):
+        # Linear interpolation between recorded targets; the joint is left alone before its first one
+        order = np.argsort(times, kind="stable")
+        times, values = times[order], values[order]
+        grid = np.arange(ticks) / rate
+        # Index of the first target after each tick; the one before it is where the joint is coming from
+        following = np.searchsorted(times, grid, side="right")
+        started = following > 0
+        previous = np.maximum(following - 1, 0)
+        following = np.minimum(following, len(times) - 1)
+        t0, v0 = times[previous], values[previous]
+        t1, v1 = times[following], values[following]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.where(t1 > t0, (grid - t0) / (t1 - t0), 1.0)
+        resampled = np.rint(v0 + (v1 - v0) * fraction).astype(np.int16)
+        resampled[~started] = UNSET
+        return resampled
+
+    def commands(self, tick, last):
+        # The commands for one step; joints already at their value in `last` are skipped, and `last` is updated
+        commands = []
+        for joint, values in self.joints.items():
+            value = int(values[tick])
+            if value != UNSET and last.get(joint) != value:
+                last[joint] = value
+                commands.append(f"S{joint}{value}")
+        commands.extend(self.events.get(tick, ()))
+        return commands
+
+
+class PlaybackEngine:
+    """Runs a Trajectory on the monotonic clock without accumulating drift."""
+
+    def __init__(self, send, on_progress=None, clock=time.monotonic):
+        self.send = send
+        self.on_progress = on_progress
+        self.clock = clock
+        self.deadline = None
+        self._span = None  # (start, end) of the current or last play()
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def stopping(self):
+        return self._stop.is_set()
+
+    def play(self, trajectory, loops=1, scale=1.0, start_at=None):
+        self._stop.clear()
+        # Every deadline is derived from the start time, never from the previous send
+        start = self.clock() if start_at is None else start_at
+        tick_time = 1.0 / (trajectory.rate * scale)
+        loop_ticks = trajectory.ticks
+        self._span = (start, start + loops * loop_ticks * tick_time)
+        for loop in range(loops):
+            # Each loop starts from nothing sent, so its first step puts every joint back to the start
+            last = {}
+            for tick in trajectory.step_ticks:
+                tick = int(tick)
+                self.deadline = start + (loop * loop_ticks + tick) * tick_time
+                if self._wait_until(self.deadline):
+                    return False
+                for command in trajectory.commands(tick, last):
+                    self.send(command)
+            if self.on_progress:
+                self.on_progress(loop + 1, loops)
+            # The next loop starts exactly one trajectory length after this one did
+            if self._wait_until(start + (loop + 1) * loop_ticks * tick_time):
+                return False
+        return True
+
+    def progress(self):
+        # Fraction of the current play() that has elapsed, by the clock
+        if self._span is None:
+            return 0.0
+        start, end = self._span
+        if end <= start:
+            return 1.0
+        return max(0.0, min(1.0, (self.clock() - start) / (end - start)))
+
+    def _wait_until(self, deadline):
+        delay = deadline - self.clock()
+        if delay > 0:
+            return self._stop.wait(delay)
+        return self._stop.is_set()
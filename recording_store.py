@@ -0,0 +1,165 @@
+import mmap
+import os
+import re
+import struct
+import time
+
+import numpy as np
+
+from scara_protocol import LINEAR_CODES, LINEAR_NAMES
+
+# File layout: a 16-byte header followed by fixed-size records, so a file can be
+# memory-mapped and indexed without parsing it. Each record is 12 bytes:
+# timestamp (float64 seconds), kind ('S' or 'G'), joint number, value (int16).
+MAGIC = b"SCARAREC"
+VERSION = 1
+HEADER = struct.Struct("<8sHHI")
+RECORD = struct.Struct("<dBBh")
+RECORD_DTYPE = np.dtype([("timestamp", "<f8"), ("kind", "u1"), ("joint", "u1"), ("value", "<i2")])
+EXTENSION = ".scararec"
+NAME_PATTERN = re.compile(r"^[a-z0-9_-]{1,64}$")
+
+
+def pack_command(command):
+    if command.startswith("S2"):
+        return ord("S"), 2, LINEAR_CODES[command[2:]]
+    if command.startswith("S"):
+        return ord("S"), int(command[1]), int(command[2:])
+    if command.startswith("G"):
+        return ord("G"), 0, int(command[1:])
+    raise ValueError(f"Cannot record command: {command}")
+
+
+def unpack_command(kind, joint, value):
+    if kind == ord("G"):
+        return f"G{value}"
+    if joint == 2:
+        return f"S2{LINEAR_NAMES[value]}"
+    return f"S{joint}{value}"
+
+
+class RecordingWriter:
+    """Appends records to disk as they happen; nothing is kept in memory."""
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        if os.path.exists(path):
+            # Unlink rather than truncate: a Recording may still have the old file mapped
+            os.remove(path)
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0))
+        # Flushed straight away so a crash in the first interval still leaves a readable, empty recording
+        self.file.flush()
+        self.count = 0
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+
+    def append(self, timestamp, command):
+        self.file.write(RECORD.pack(timestamp, *pack_command(command)))
+        self.count += 1
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self.file.flush()
+            self._last_flush = now
+
+    def close(self):
+        self.file.close()
+
+
+class Recording:
+    """Read-only, memory-mapped view of a recording that behaves like a list of (timestamp, command)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._map = None
+        self._count = 0
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                # Cut off before its header reached the disk: an empty recording
+                return
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self._map.close()
+            raise ValueError(f"Not a SCARA recording: {path}")
+        # A crash mid-write can leave a partial record at the end; ignore it
+        self._count = (len(self._map) - HEADER.size) // RECORD.size
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("recording index out of range")
+        timestamp, kind, joint, value = RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size)
+        return timestamp, unpack_command(kind, joint, value)
+
+    def __iter__(self):
+        if not self._count:
+            return
+        end = HEADER.size + self._count * RECORD.size
+        for timestamp, kind, joint, value in RECORD.iter_unpack(memoryview(self._map)[HEADER.size:end]):
+            yield timestamp, unpack_command(kind, joint, value)
+
+    def __bool__(self):
+        return self._count > 0
+
+    def raw(self):
+        # Zero-copy access to the record bytes, e.g. for numpy.frombuffer
+        if self._map is None:
+            return memoryview(b"")
+        return memoryview(self._map)[HEADER.size:HEADER.size + self._count * RECORD.size]
+
+    @property
+    def duration(self):
+        return self[-1][0] if self._count else 0.0
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+
+
+class RecordingStore:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name):
+        if not NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid recording name: {name!r} (use a-z, 0-9, _ and -)")
+        return os.path.join(self.directory, name + EXTENSION)
+
+    def names(self):
+        return sorted(entry[:-len(EXTENSION)] for entry in os.listdir(self.directory) if entry.endswith(EXTENSION))
+
+    def create(self, name):
+        return RecordingWriter(self.path(name))
+
+    def open(self, name):
+        path = self.path(name)
+        if not os.path.exists(path):
+            raise ValueError(f"No recording named {name}")
+        return Recording(path)
+
+    def save(self, source, name):
+        # Copies an existing recording (e.g. the last take) under a new name
+        target = self.path(name)
+        with open(self.path(source), "rb") as src, open(target + ".tmp", "wb") as dst:
+            while True:
+                chunk = src.read(1 << 20)
+                if not chunk:
+                    break
+                dst.write(chunk)
+        os.replace(target + ".tmp", target)
+
+    def write(self, name, movements):
+        target = self.path(name)
+        writer = RecordingWriter(target + ".tmp")
+        try:
+            for timestamp, command in movements:
+                writer.append(timestamp, command)
+        finally:
+            writer.close()
+        os.replace(target + ".tmp", target)
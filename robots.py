@@ -0,0 +1,414 @@
+import re
+import threading
+import time
+
+from kinematics import IKCache, clamp_z
+from path_simplify import optimise_recording, summary
+from playback_engine import PlaybackEngine, Trajectory
+from recording_store import Recording, RecordingStore
+from scara_protocol import encode_command, encode_pose
+from serial_writer import AckWindow, SerialReader, SerialWriter
+from servo_mailbox import SERVO_RANGES, ServoMailbox, servo_command
+from state_store import StateStore
+
+LAST_TAKE = "last"  # The take being recorded always goes here; save copies it under a name
+ARM_ID_PATTERN = re.compile(r"^[a-z0-9_]{1,16}$")
+
+
+class Robot:
+    """One arm with its own serial writer, servo mailbox, recordings, playback and Cartesian state.
+
+    Hooks let the app mirror what the arm does: on_servos(robot, changes) after a mailbox
+    flush, on_joint(robot, command) after a firmware-angle command, and
+    on_progress(robot, loop, loops) during playback. Gripper, recording and playback
+    state lives in `state` (a StateStore) for anything that wants to follow changes.
+    """
+
+    def __init__(self, robot_id, recordings_dir, geometry, baudrate=9600, control_rate=20.0, binary=False,
+                 linear_speed=10.0, on_servos=None, on_joint=None, on_progress=None, ack_window=None,
+                 flight_recorder=None, simplify_tolerance=1.0):
+        self.id = robot_id
+        self.transport = None
+        # With an ack window, writes are paced by the firmware's replies instead of the estimated link speed
+        self.acks = AckWindow(ack_window) if ack_window else None
+        self.reader = None
+        self.writer = SerialWriter(baudrate=baudrate, acks=self.acks)
+        if flight_recorder:
+            arm_code = flight_recorder.arm_code(robot_id)
+            self.writer.on_write = lambda data, source, latency: flight_recorder.record(arm_code, source, data, latency)
+        self.mailbox = ServoMailbox(rate=control_rate)
+        self.control_rate = control_rate
+        self.binary = binary
+        self.store = RecordingStore(recordings_dir)
+        self.geometry = geometry
+        self.ik_cache = IKCache(geometry)
+        self.linear_speed = linear_speed
+        self.simplify_tolerance = simplify_tolerance
+        self.linear_z = 0.0  # Dead-reckoned actuator height in mm, assumed to start at the bottom
+        self._z_direction = 0  # 1 going up, -1 going down, since _z_since
+        self._z_since = 0.0
+        self._z_stop = None  # Timer that ends move_to's actuator travel
+        self._z_lock = threading.RLock()
+        self.state = StateStore(gripper="Release", recording=False, playing=False, recording_name=None)
+        self.positions = {}  # Last slider position (0-180) sent for each of servos 1, 3 and 4
+        self.on_servos = on_servos
+        self.on_joint = on_joint
+        self.on_progress = on_progress
+        self.recording = []  # Sequence of (timestamp, command); a memory-mapped Recording once loaded
+        self._recording_writer = None
+        self._recording_start = 0.0
+        self._recording_lock = threading.Lock()
+        self._take_lock = threading.RLock()  # Guards swapping, compiling and closing the loaded recording
+        self.playback = PlaybackEngine(self.send_joint, self._report_progress)
+        self._playback_lock = threading.Lock()
+        self._compiled = (None, None)  # (recording, Trajectory) so replays skip recompiling
+        self.uploaded = None  # Trajectory sent over TCP with `upload`, played with `run`
+        self._mailbox_thread = None
+        if LAST_TAKE in self.store.names():
+            try:
+                self.load(LAST_TAKE)
+            except (ValueError, OSError) as e:
+                print(f"[{self.id}] Could not load the last take: {e}")
+
+    @property
+    def gripper(self):
+        return self.state.get("gripper")
+
+    @property
+    def is_recording(self):
+        return self.state.get("recording")
+
+    @property
+    def is_playing(self):
+        return self.state.get("playing")
+
+    @property
+    def recording_name(self):
+        return self.state.get("recording_name")
+
+    def start(self, transport=None):
+        # The mailbox runs straight away; commands wait in the writer until the transport is attached
+        self._mailbox_thread = threading.Thread(target=self.mailbox.run, args=(self.update_servos,), daemon=True)
+        self._mailbox_thread.start()
+        if transport is not None:
+            self.attach(transport)
+        return self
+
+    def attach(self, transport):
+        self.transport = transport
+        if self.acks:
+            self.reader = SerialReader(transport, self.acks).start()
+        self.writer.start(transport)
+
+    def close(self):
+        self.playback.stop()
+        self.mailbox.close()
+        self.writer.stop()
+        if self.reader:
+            self.reader.stop()
+        if self.transport:
+            self.transport.close()
+
+    def send(self, command, source=None, requested_at=None):
+        if command.startswith("S2"):
+            with self._z_lock:
+                # Any actuator command ends the travel so far, and a move_to's pending stop with it
+                self._settle_z(command[2:])
+                self._transmit(command, source, requested_at)
+        else:
+            self._transmit(command, source, requested_at)
+
+    def _transmit(self, command, source, requested_at):
+        self.writer.send(encode_command(command) if self.binary else command, source, requested_at)
+        self._record(command)
+        if command.startswith("G"):
+            self.state.update(gripper="Hold" if command == "G1" else "Release")
+
+    def post(self, servo, position, source=None):
+        self.mailbox.post(servo, position, source)
+
+    def post_many(self, positions, source=None):
+        self.mailbox.post_many(positions, source)
+
+    def update_servos(self, changes):
+        commands = {servo: servo_command(servo, position) for servo, position in changes.items()}
+        origins = {servo: self.mailbox.origins.get(servo, (None, None)) for servo in changes}
+        if self.binary:
+            # One frame carries every joint that changed in this control period; it is credited to the earliest post
+            source, posted_at = min(origins.values(), key=lambda origin: origin[1] or 0.0)
+            self.writer.send(encode_pose(**{f"s{servo}": int(command[2:]) for servo, command in commands.items()}),
+                             source, posted_at)
+            for command in commands.values():
+                self._record(command)
+        else:
+            for servo, command in commands.items():
+                self.send(command, *origins[servo])
+        self.positions.update(changes)
+        if self.on_servos:
+            self.on_servos(self, changes)
+
+    def send_joint(self, command, source="playback"):
+        # Firmware-angle commands that skip the 0-180 slider mailbox (playback, Cartesian moves)
+        self.send(command, source)
+        if command[:2] in ("S1", "S3", "S4"):
+            servo = int(command[1])
+            self.positions[servo] = round(int(command[2:]) * 180 / SERVO_RANGES[servo])
+            # The mailbox's idea of what was last sent is now stale
+            self.mailbox.reset()
+        if self.on_joint:
+            self.on_joint(self, command)
+
+    def _record(self, command):
+        if self.is_recording:
+            with self._recording_lock:
+                if self._recording_writer:
+                    timestamp = time.time() - self._recording_start
+                    self._recording_writer.append(timestamp, command)
+                    print(f"[{self.id}] Recorded: {timestamp}, {command}")
+
+    def begin_recording(self):
+        if self.recording_name == LAST_TAKE:
+            # The new take replaces this file
+            self._unload()
+        with self._recording_lock:
+            if self._recording_writer:
+                self._recording_writer.close()
+            self._recording_writer = self.store.create(LAST_TAKE)
+            self._recording_start = time.time()
+            self.state.update(recording=True)
+
+    def end_recording(self):
+        with self._recording_lock:
+            self.state.update(recording=False)
+            if self._recording_writer:
+                self._recording_writer.close()
+                self._recording_writer = None
+                self.load(LAST_TAKE)
+
+    def load(self, name):
+        with self._take_lock:
+            recording = self.store.open(name)
+            previous, self.recording = self.recording, recording
+            self._compiled = (None, None)
+            if isinstance(previous, Recording):
+                previous.close()
+        self.state.update(recording_name=name)
+        print(f"[{self.id}] Loaded recording {name}: {len(self.recording)} steps, {self.recording.duration:.1f}s")
+
+    def _unload(self):
+        # Closes the loaded recording's map: Windows will not delete or replace a file that is still mapped
+        with self._take_lock:
+            if isinstance(self.recording, Recording):
+                self.recording.close()
+            self.recording = []
+            self._compiled = (None, None)
+        self.state.update(recording_name=None)
+
+    def save(self, name):
+        if self.is_recording:
+            raise ValueError("Stop recording first")
+        if self.recording_name is None:
+            raise ValueError("Nothing recorded yet")
+        if name != self.recording_name:
+            self.store.save(self.recording_name, name)
+        self.load(name)
+
+    def optimise(self, tolerance=None):
+        # Simplifies the loaded recording into the last take (the original is left alone) and loads it
+        tolerance = self.simplify_tolerance if tolerance is None else tolerance
+        if self.is_recording:
+            raise ValueError("Stop recording first")
+        with self._take_lock:
+            if not self.recording:
+                raise ValueError("Nothing recorded yet")
+            movements, report = optimise_recording(self.recording, tolerance, 1.0 / self.control_rate,
+                                                   self.control_rate)
+            self._unload()
+        self.store.write(LAST_TAKE, movements)
+        self.load(LAST_TAKE)
+        print(f"[{self.id}] {summary(report)}")
+        return report
+
+    def trajectory(self, recording=None):
+        with self._take_lock:
+            recording = self.recording if recording is None else recording
+            if not recording:
+                return None
+            if self._compiled[0] is not recording:
+                self._compiled = (recording, Trajectory.compile(recording, self.control_rate))
+            return self._compiled[1]
+
+    def upload(self, recording):
+        self.uploaded = Trajectory.compile(recording, self.control_rate)
+        return self.uploaded
+
+    def play(self, trajectory, loops=1, scale=1.0, start_at=None):
+        # Blocks until done; returns False if stopped. Arms given the same start_at stay in step.
+        self.playback.stop()
+        with self._playback_lock:
+            self.state.update(playing=True)
+            try:
+                return self.playback.play(trajectory, loops, scale, start_at)
+            finally:
+                self.state.update(playing=False)
+
+    def stop_playback(self):
+        self.playback.stop()
+
+    def _report_progress(self, loop, loops):
+        print(f"[{self.id}] Loop {loop}/{loops}")
+        if self.on_progress:
+            self.on_progress(self, loop, loops)
+
+    def _settle_z(self, direction):
+        now = time.monotonic()
+        if self._z_stop:
+            self._z_stop.cancel()
+            self._z_stop = None
+        if self._z_direction:
+            travelled = self._z_direction * self.linear_speed * (now - self._z_since)
+            self.linear_z = float(clamp_z(self.geometry, self.linear_z + travelled))
+        self._z_direction = {"up": 1, "down": -1}.get(direction, 0)
+        self._z_since = now
+
+    def _end_z_move(self):
+        with self._z_lock:
+            # A later actuator command has already taken over from this timer
+            if self._z_stop is threading.current_thread():
+                self.send("S2stop", "move")
+
+    def move_to(self, x, y, z=None, heading=None):
+        solution = self.ik_cache.solve(x, y, heading)
+        if solution is None:
+            raise ValueError(f"Target ({x}, {y}) is out of reach")
+        for servo, angle in zip((1, 3, 4), solution):
+            self.send_joint(f"S{servo}{angle}", "move")
+        if z is not None:
+            # The actuator only knows up/down/stop, so z is dead-reckoned from its travel speed
+            z = float(clamp_z(self.geometry, z))
+            with self._z_lock:
+                # Where the actuator is now, even if an earlier move is still travelling
+                moving = self._z_direction
+                self._settle_z("stop")
+                travel = z - self.linear_z
+                if abs(travel) > 0.5:
+                    self.send("S2up" if travel > 0 else "S2down", "move")
+                    self._z_stop = threading.Timer(abs(travel) / self.linear_speed, self._end_z_move)
+                    self._z_stop.daemon = True
+                    self._z_stop.start()
+                elif moving:
+                    self.send("S2stop", "move")
+        return solution
+
+    def status(self):
+        link = type(self.transport).__name__ if self.transport else "no transport"
+        if self.acks and self.acks.last_rtt is not None:
+            link += f" (rtt {self.acks.last_rtt * 1000:.0f} ms)"
+        _, state = self.state.snapshot()
+        return (f"{self.id}: {link}, gripper {state['gripper']}, "
+                f"{'playing' if state['playing'] else 'recording' if state['recording'] else 'idle'}, "
+                f"recording {state['recording_name'] or 'none'}")
+
+    def execute(self, line):
+        # The TCP command set for an arm without a GUI of its own; returns the reply text. Gripper, recording
+        # and playback changes are left out of the reply, since followers of `state` announce them.
+        verb, _, arg = line.partition(" ")
+        arg = arg.strip()
+        if verb[:2] in ("s1", "s3", "s4") and verb[2:].isdigit():
+            self.post(int(verb[1]), int(verb[2:]), "tcp")
+            return None
+        if verb == "setall":
+            self.post_many(parse_setall(arg), "tcp")
+            return None
+        if verb in ("up", "down", "stop"):
+            self.send(f"S2{verb}", "tcp")
+            return f"Servo 2 {'stopped' if verb == 'stop' else 'moving ' + verb}"
+        if verb in ("grip", "release"):
+            before = self.gripper
+            self.send("G1" if verb == "grip" else "G0", "tcp")
+            if self.gripper != before:
+                return None
+            return "Gripper holding" if verb == "grip" else "Gripper releasing"
+        if verb == "record":
+            restarted = self.is_recording
+            self.begin_recording()
+            return "Recording started" if restarted else None
+        if verb == "stop_recording":
+            stopped = self.is_recording
+            self.end_recording()
+            return None if stopped else "Recording stopped"
+        if verb == "save":
+            self.save(arg)
+            return f"Saved recording {arg}"
+        if verb == "load":
+            self.load(arg)
+            return f"Loaded recording {arg} ({len(self.recording)} steps)"
+        if verb == "simplify":
+            return summary(self.optimise(float(arg) if arg else None))
+        if verb == "list":
+            return "Recordings: " + ", ".join(self.store.names())
+        if verb == "move":
+            values = [float(value) for value in arg.split()]
+            if len(values) < 2:
+                raise ValueError("Usage: move x y [z [heading]]")
+            s1, s3, s4 = self.move_to(*values[:4])
+            return f"Moving to S1{s1} S3{s3} S4{s4}"
+        if verb == "stop_playback":
+            playing = self.is_playing
+            self.stop_playback()
+            return None if playing else "Playback stopped"
+        if verb == "status":
+            return self.status()
+        return "Invalid command"
+
+
+def parse_setall(arg):
+    # "setall 90 45 120": servo 1, 3 and 4 slider positions in one message
+    values = arg.split()
+    if len(values) != 3:
+        raise ValueError("Usage: setall s1 s3 s4")
+    return {servo: int(float(value)) for servo, value in zip((1, 3, 4), values)}
+
+
+class RobotRegistry:
+    """Every arm this host drives, by id; the first one added is the default (the one in the GUI)."""
+
+    def __init__(self):
+        self.robots = {}
+
+    def add(self, robot):
+        if not ARM_ID_PATTERN.match(robot.id):
+            raise ValueError(f"Invalid arm id: {robot.id!r} (use a-z, 0-9 and _)")
+        if robot.id in self.robots:
+            raise ValueError(f"Duplicate arm id: {robot.id}")
+        self.robots[robot.id] = robot
+        return robot
+
+    @property
+    def default(self):
+        return next(iter(self.robots.values()))
+
+    def get(self, robot_id):
+        robot = self.robots.get(robot_id)
+        if robot is None:
+            raise ValueError(f"No arm {robot_id} (arms: {', '.join(self.robots)})")
+        return robot
+
+    def select(self, target):
+        # "all", one id, or a comma-separated list of ids
+        if target == "all":
+            return list(self.robots.values())
+        return [self.get(robot_id) for robot_id in target.split(",")]
+
+    def play(self, robots, trajectories, loops=1, scale=1.0, lead=0.2):
+        # Compile first, then give every arm the same start deadline so they run in step
+        start_at = time.monotonic() + lead
+        threads = [threading.Thread(target=robot.play, args=(trajectory, loops, scale, start_at), daemon=True)
+                   for robot, trajectory in zip(robots, trajectories)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def close(self):
+        for robot in self.robots.values():
+            robot.close()
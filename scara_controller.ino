@@ -3,6 +3,9 @@
 
 Adafruit_PWMServoDriver pwm = Adafruit_PWMServoDriver();
 
+#define SERIAL_BAUD 9600 // Raise to 115200 together with BAUD_RATE in Gesture_control.py
+#define VERBOSE 1 // Echo Servo/Pulse details for text commands
+
 #define SERVO_FREQ 50
 #define MIN_PULSE 0 // 0.5ms (common servo min)
 #define MAX_PULSE 500 // 2.5ms (common servo max)
@@ -13,8 +16,24 @@ Adafruit_PWMServoDriver pwm = Adafruit_PWMServoDriver();
 #define SERVO4_CHANNEL 3 // Link 4 (Servo 4)
 #define GRIPPER_CHANNEL 4 // Gripper
 
+// Binary frames: SYNC, type, payload length, payload, checksum (see scara_protocol.py)
+#define FRAME_SYNC 0xA5
+#define CMD_POSE 0x01
+#define CMD_JOINT 0x02
+#define CMD_LINEAR 0x03
+#define CMD_GRIPPER 0x04
+#define NO_CHANGE 0xFFFF
+#define MAX_FRAME 12
+
+String textBuffer = "";
+uint8_t frame[MAX_FRAME];
+int frameLen = 0;
+bool inFrame = false;
+bool discarding = false; // After a bad frame, drop bytes until the next SYNC or newline
+bool echoDetails = false; // Binary frames only get a one-line K/E reply
+
 void setup() {
-Serial.begin(9600);
+Serial.begin(SERIAL_BAUD);
 pwm.begin();
 pwm.setPWMFreq(SERVO_FREQ);
 // Initial positions
@@ -26,38 +45,15 @@ pwm.setPWM(GRIPPER_CHANNEL, 0, MIN_PULSE);
 Serial.println("Arduino initialized");
 }
 
-void loop() {
-if (Serial.available() > 0) {
-String command = Serial.readStringUntil('\n');
-command.trim();
-Serial.print("Received: '"); Serial.print(command); Serial.println("'");
-
-if (command.startsWith("S")) {
-int servo = command.substring(1, 2).toInt();
-String value = command.substring(2);
-Serial.print("Servo: "); Serial.print(servo); Serial.print(", Value: "); Serial.println(value);
-
-if (servo == 2) {
-if (value == "up") {
-int pulse = map(45, 0, 180, MIN_PULSE, MAX_PULSE); // Larger step for visibility
-pwm.setPWM(SERVO2_CHANNEL, 0, 500);
-Serial.print("Servo 2 Up, Pulse: "); Serial.println(500);
-} else if (value == "down") {
-pwm.setPWM(SERVO2_CHANNEL, 0, 200);
-Serial.println("Servo 2 Down, Pulse: MIN_PULSE");
-} else if (value == "stop") {
-int pulse = map(90, 0, 180, MIN_PULSE, MAX_PULSE);
-pwm.setPWM(SERVO2_CHANNEL, 0, 0);
-Serial.print("Servo 2 Stop, Pulse: "); Serial.println(pulse);
-}
-} else {
-int angle = value.toInt();
+void setServoAngle(int servo, int angle) {
 if (angle < 0) angle = 0; // Clamp to valid range
 int max_angle = (servo == 1) ? 270 : (servo == 3) ? 360 : 180;
 if (angle > max_angle) angle = max_angle;
 int pulse = map(angle, 0, max_angle, MIN_PULSE, MAX_PULSE);
+if (echoDetails) {
 Serial.print("Servo "); Serial.print(servo); Serial.print(", Angle: "); Serial.print(angle);
 Serial.print(", Pulse: "); Serial.println(pulse);
+}
 
 switch (servo) {
 case 1:
@@ -71,16 +67,120 @@ pwm.setPWM(SERVO4_CHANNEL, 0, pulse);
 break;
 }
 }
-} else if (command.startsWith("G")) {
-int state = command.substring(1).toInt();
-Serial.print("Gripper State: "); Serial.println(state);
+
+void setLinear(int direction) {
+// 0 stop, 1 up, 2 down
+if (direction == 1) {
+pwm.setPWM(SERVO2_CHANNEL, 0, 500);
+if (echoDetails) { Serial.print("Servo 2 Up, Pulse: "); Serial.println(500); }
+} else if (direction == 2) {
+pwm.setPWM(SERVO2_CHANNEL, 0, 200);
+if (echoDetails) Serial.println("Servo 2 Down, Pulse: MIN_PULSE");
+} else {
+int pulse = map(90, 0, 180, MIN_PULSE, MAX_PULSE);
+pwm.setPWM(SERVO2_CHANNEL, 0, 0);
+if (echoDetails) { Serial.print("Servo 2 Stop, Pulse: "); Serial.println(pulse); }
+}
+}
+
+void setGripper(int state) {
+if (echoDetails) { Serial.print("Gripper State: "); Serial.println(state); }
 if (state == 1) {
 pwm.setPWM(GRIPPER_CHANNEL, 0, 380);
-Serial.println("Gripper Hold, Pulse: MAX_PULSE");
+if (echoDetails) Serial.println("Gripper Hold, Pulse: MAX_PULSE");
 } else {
 pwm.setPWM(GRIPPER_CHANNEL, 0, 180);
-Serial.println("Gripper Release, Pulse: MIN_PULSE");
+if (echoDetails) Serial.println("Gripper Release, Pulse: MIN_PULSE");
+}
 }
+
+void handleText(String command) {
+echoDetails = VERBOSE;
+Serial.print("Received: '"); Serial.print(command); Serial.println("'");
+
+if (command.startsWith("S")) {
+int servo = command.substring(1, 2).toInt();
+String value = command.substring(2);
+if (echoDetails) { Serial.print("Servo: "); Serial.print(servo); Serial.print(", Value: "); Serial.println(value); }
+
+if (servo == 2) {
+if (value == "up") {
+setLinear(1);
+} else if (value == "down") {
+setLinear(2);
+} else if (value == "stop") {
+setLinear(0);
+}
+} else {
+setServoAngle(servo, value.toInt());
+}
+} else if (command.startsWith("G")) {
+setGripper(command.substring(1).toInt());
+}
+}
+
+uint16_t frameWord(int offset) {
+return frame[offset] | (frame[offset + 1] << 8);
+}
+
+void handleFrame() {
+echoDetails = false;
+uint8_t cmd = frame[1];
+uint8_t sum = 0;
+for (int i = 1; i < frameLen - 1; i++) sum += frame[i];
+if (sum != frame[frameLen - 1]) {
+discarding = true;
+Serial.println("E");
+return;
+}
+switch (cmd) {
+case CMD_POSE:
+if (frameWord(3) != NO_CHANGE) setServoAngle(1, frameWord(3));
+if (frameWord(5) != NO_CHANGE) setServoAngle(3, frameWord(5));
+if (frameWord(7) != NO_CHANGE) setServoAngle(4, frameWord(7));
+if (frame[9] != 0xFF) setGripper(frame[9]);
+break;
+case CMD_JOINT:
+setServoAngle(frame[3], frameWord(4));
+break;
+case CMD_LINEAR:
+setLinear(frame[3]);
+break;
+case CMD_GRIPPER:
+setGripper(frame[3]);
+break;
+}
+Serial.println("K");
+}
+
+void loop() {
+while (Serial.available() > 0) {
+uint8_t b = Serial.read();
+if (inFrame) {
+frame[frameLen++] = b;
+// Drop frames whose declared length cannot fit
+if (frameLen == 3 && frame[2] + 4 > MAX_FRAME) {
+inFrame = false;
+discarding = true;
+Serial.println("E");
+} else if (frameLen > 3 && frameLen == frame[2] + 4) {
+inFrame = false;
+handleFrame();
+}
+} else if (discarding && b != FRAME_SYNC) {
+// The rest of a rejected frame is not text; a newline ends it like a text line would
+if (b == '\n') discarding = false;
+} else if (b == FRAME_SYNC && textBuffer.length() == 0) {
+discarding = false;
+inFrame = true;
+frame[0] = b;
+frameLen = 1;
+} else if (b == '\n') {
+textBuffer.trim();
+handleText(textBuffer);
+textBuffer = "";
+} else {
+textBuffer += (char)b;
 }
 }
 }
@@ -0,0 +1,108 @@
+import struct
+
+# Frame layout: SYNC, type, payload length, payload, checksum
+# The checksum is the low byte of the sum of type, length and payload.
+SYNC = 0xA5
+NO_CHANGE = 0xFFFF
+
+CMD_POSE = 0x01      # <HHHB: servo 1, servo 3, servo 4 angles, gripper (0xFF = unchanged)
+CMD_JOINT = 0x02     # <BH: servo number, angle
+CMD_LINEAR = 0x03    # <B: 0 stop, 1 up, 2 down
+CMD_GRIPPER = 0x04   # <B: 0 release, 1 hold
+
+PAYLOAD_FORMATS = {
+    CMD_POSE: struct.Struct("<HHHB"),
+    CMD_JOINT: struct.Struct("<BH"),
+    CMD_LINEAR: struct.Struct("<B"),
+    CMD_GRIPPER: struct.Struct("<B"),
+}
+LINEAR_CODES = {"stop": 0, "up": 1, "down": 2}
+LINEAR_NAMES = {code: name for name, code in LINEAR_CODES.items()}
+
+ACK = b"K\n"
+NAK = b"E\n"
+
+
+def checksum(body):
+    return sum(body) & 0xFF
+
+
+def encode_frame(cmd, *fields):
+    payload = PAYLOAD_FORMATS[cmd].pack(*fields)
+    body = bytes((cmd, len(payload))) + payload
+    return bytes((SYNC,)) + body + bytes((checksum(body),))
+
+
+def encode_pose(s1=None, s3=None, s4=None, gripper=None):
+    return encode_frame(
+        CMD_POSE,
+        NO_CHANGE if s1 is None else s1,
+        NO_CHANGE if s3 is None else s3,
+        NO_CHANGE if s4 is None else s4,
+        0xFF if gripper is None else gripper,
+    )
+
+
+def encode_command(command):
+    # Translates one text protocol command ("S1135", "S2up", "G1") into a frame
+    if command.startswith("S2"):
+        return encode_frame(CMD_LINEAR, LINEAR_CODES[command[2:]])
+    if command.startswith("S"):
+        return encode_frame(CMD_JOINT, int(command[1]), int(command[2:]))
+    if command.startswith("G"):
+        return encode_frame(CMD_GRIPPER, 1 if int(command[1:]) == 1 else 0)
+    raise ValueError(f"Unknown command: {command}")
+
+
+def frame_to_commands(cmd, fields):
+    # The text protocol equivalent of a decoded frame
+    if cmd == CMD_POSE:
+        commands = [f"S{servo}{angle}" for servo, angle in zip((1, 3, 4), fields[:3]) if angle != NO_CHANGE]
+        if fields[3] != 0xFF:
+            commands.append(f"G{fields[3]}")
+        return commands
+    if cmd == CMD_JOINT:
+        return [f"S{fields[0]}{fields[1]}"]
+    if cmd == CMD_LINEAR:
+        return [f"S2{LINEAR_NAMES[fields[0]]}"]
+    if cmd == CMD_GRIPPER:
+        return [f"G{fields[0]}"]
+    return []
+
+
+class FrameDecoder:
+    """Incremental decoder; resynchronises on the next SYNC byte after a bad frame."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.errors = 0
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        buf = self.buffer
+        while True:
+            start = buf.find(SYNC)
+            if start < 0:
+                buf.clear()
+                break
+            if start:
+                del buf[:start]
+            if len(buf) < 3:
+                break
+            cmd, length = buf[1], buf[2]
+            fmt = PAYLOAD_FORMATS.get(cmd)
+            if fmt is None or fmt.size != length:
+                self.errors += 1
+                del buf[:1]
+                continue
+            end = 3 + length + 1
+            if len(buf) < end:
+                break
+            if checksum(buf[1:end - 1]) != buf[end - 1]:
+                self.errors += 1
+                del buf[:1]
+                continue
+            frames.append((cmd, fmt.unpack(bytes(buf[3:end - 1]))))
+            del buf[:end]
+        return frames
@@ -0,0 +1,388 @@
+import argparse
+import json
+import tempfile
+import threading
+import time
+from collections import deque
+
+from kinematics import ArmGeometry
+from robots import Robot
+from scara_protocol import CMD_GRIPPER, CMD_JOINT, CMD_LINEAR, CMD_POSE, NO_CHANGE, SYNC
+
+# Constants from scara_controller.ino
+MIN_PULSE = 0
+MAX_PULSE = 500
+MAX_ANGLES = {1: 270, 3: 360, 4: 180}
+CHANNELS = {1: 0, 2: 1, 3: 2, 4: 3, "gripper": 4}
+MAX_FRAME = 12
+RX_BUFFER = 64  # Arduino hardware serial buffers, each way
+TX_BUFFER = 64
+
+
+def arduino_map(x, in_min, in_max, out_min, out_max):
+    # Arduino's integer map(): truncates towards zero
+    return int((x - in_min) * (out_max - out_min) / (in_max - in_min)) + out_min
+
+
+def to_int(text):
+    # String.toInt(): the leading integer, or 0
+    text = text.strip()
+    end = 1 if text[:1] in ("-", "+") else 0
+    while end < len(text) and text[end].isdigit():
+        end += 1
+    try:
+        return int(text[:end])
+    except ValueError:
+        return 0
+
+
+class SimulatedJoint:
+    """A hobby servo that slews towards its commanded angle at a fixed rate."""
+
+    def __init__(self, max_angle, slew_rate):
+        self.max_angle = max_angle
+        self.slew_rate = slew_rate
+        self.target = 0
+        self._from = 0.0
+        self._since = 0.0
+
+    def position(self, now):
+        travel = self.slew_rate * max(0.0, now - self._since)
+        if abs(self.target - self._from) <= travel:
+            return float(self.target)
+        return self._from + travel * (1 if self.target > self._from else -1)
+
+    def command(self, angle, now):
+        self._from = self.position(now)
+        self._since = now
+        self.target = angle
+
+
+class SimulatedArm:
+    """scara_controller.ino in software, behind the same write()/readline()/close() as a serial port.
+
+    Bytes reach the firmware at the link's baud rate into a 64-byte receive buffer
+    (overflowing bytes are lost, as on the board). The firmware handles commands one at
+    a time, taking processing_time each plus any time blocked on a full transmit buffer
+    while it prints its replies. Angles are clamped and mapped to PWM pulses like
+    setServoAngle(), and each joint slews at slew_rate degrees per second.
+
+    speed scales simulated time against the wall clock (2 runs twice as fast); with
+    speed=0 nothing waits and time only advances by the modelled costs.
+    """
+
+    def __init__(self, baudrate=9600, speed=1.0, processing_time=0.0005, slew_rate=300.0, linear_speed=10.0,
+                 z_max=100.0, boot_time=1.5, verbose=True):
+        self.baudrate = baudrate
+        self.byte_time = 10.0 / baudrate  # 8N1
+        self.speed = speed
+        self.processing_time = processing_time
+        self.linear_speed = linear_speed
+        self.z_max = z_max
+        self.verbose = verbose
+        self.joints = {servo: SimulatedJoint(max_angle, slew_rate) for servo, max_angle in MAX_ANGLES.items()}
+        self.pulses = dict.fromkeys(CHANNELS.values(), MIN_PULSE)
+        self.gripper = 0
+        self.linear = 0  # 0 stop, 1 up, 2 down
+        self._z = 0.0
+        self._z_since = 0.0
+        self._started = time.monotonic()
+        self._link_free = 0.0  # When the host-to-board line finishes sending what it has been given
+        self._incoming = deque()  # (arrival time, byte)
+        self._unread = deque()  # Read times of bytes still in the receive buffer
+        self._outgoing = deque()  # (delivery time, line)
+        self._tx_done = 0.0
+        self._clock = boot_time  # Firmware time; setup() has run once this is reached
+        self._text = bytearray()
+        self._frame = bytearray()
+        self._in_frame = False
+        self._discarding = False
+        self._echo_details = False
+        self._cond = threading.Condition()
+        self._closed = False
+        self.commands = 0
+        self.frames = 0
+        self.overruns = 0
+        self.clamped = 0
+        self.naks = 0
+        self.busy = 0.0
+        self.max_rx_fill = 0
+        self._print("Arduino initialized")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def now(self):
+        # Simulated seconds since the board was reset
+        if not self.speed:
+            return self._clock
+        return (time.monotonic() - self._started) * self.speed
+
+    def _sleep_until(self, deadline):
+        # Returns False once closed
+        with self._cond:
+            while not self._closed and self.speed:
+                delay = (deadline - self.now()) / self.speed
+                if delay <= 0:
+                    break
+                self._cond.wait(delay)
+            return not self._closed
+
+    def write(self, data):
+        with self._cond:
+            arrival = max(self._link_free, self.now())
+            for byte in data:
+                arrival += self.byte_time
+                self._incoming.append((arrival, byte))
+            self._link_free = arrival
+            self._cond.notify_all()
+
+    def readline(self, timeout=1.0):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._closed:
+                if self._outgoing:
+                    delay = (self._outgoing[0][0] - self.now()) / self.speed if self.speed else 0.0
+                    if delay <= 0:
+                        return self._outgoing.popleft()[1]
+                else:
+                    delay = timeout
+                delay = min(delay, deadline - time.monotonic())
+                if delay <= 0:
+                    break
+                self._cond.wait(delay)
+            return b""
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(1)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._incoming and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                arrival, byte = self._incoming.popleft()
+            # The byte is lost if the receive buffer was full when it arrived
+            while self._unread and self._unread[0] <= arrival:
+                self._unread.popleft()
+            if len(self._unread) >= RX_BUFFER:
+                self.overruns += 1
+                continue
+            read_at = max(arrival, self._clock)
+            self._unread.append(read_at)
+            self.max_rx_fill = max(self.max_rx_fill, len(self._unread))
+            if not self._sleep_until(read_at):
+                return
+            self._clock = read_at
+            started = self._clock
+            if self._receive(byte):
+                self._clock += self.processing_time
+                self.busy += self._clock - started
+
+    def _receive(self, byte):
+        # loop() in the sketch for one byte; returns True when a command was handled
+        if self._in_frame:
+            self._frame.append(byte)
+            length = len(self._frame)
+            if length == 3 and self._frame[2] + 4 > MAX_FRAME:
+                self._in_frame = False
+                self._discarding = True
+                self.naks += 1
+                self._print("E")
+                return True
+            if length > 3 and length == self._frame[2] + 4:
+                self._in_frame = False
+                self._handle_frame(self._frame)
+                return True
+            return False
+        if self._discarding and byte != SYNC:
+            if byte == ord("\n"):
+                self._discarding = False
+            return False
+        if byte == SYNC and not self._text:
+            self._discarding = False
+            self._in_frame = True
+            self._frame = bytearray((byte,))
+            return False
+        if byte == ord("\n"):
+            command = self._text.decode(errors="replace").strip()
+            self._text = bytearray()
+            self._handle_text(command)
+            return True
+        self._text.append(byte)
+        return False
+
+    def _print(self, line):
+        # Serial.println(): the sketch blocks while the transmit buffer is full
+        data = (line + "\r\n").encode()
+        self._tx_done = max(self._tx_done, self._clock) + len(data) * self.byte_time
+        self._clock = max(self._clock, self._tx_done - TX_BUFFER * self.byte_time)
+        with self._cond:
+            self._outgoing.append((self._tx_done, data))
+            self._cond.notify_all()
+
+    def _handle_text(self, command):
+        self._echo_details = self.verbose
+        self.commands += 1
+        self._print(f"Received: '{command}'")
+        if command.startswith("S"):
+            servo = to_int(command[1:2])
+            value = command[2:]
+            if self._echo_details:
+                self._print(f"Servo: {servo}, Value: {value}")
+            if servo == 2:
+                if value in ("up", "down", "stop"):
+                    self._set_linear({"stop": 0, "up": 1, "down": 2}[value])
+            else:
+                self._set_servo_angle(servo, to_int(value))
+        elif command.startswith("G"):
+            self._set_gripper(to_int(command[1:]))
+
+    def _handle_frame(self, frame):
+        self._echo_details = False
+        self.frames += 1
+        self.commands += 1
+        if sum(frame[1:-1]) & 0xFF != frame[-1]:
+            self._discarding = True
+            self.naks += 1
+            self._print("E")
+            return
+
+        def word(offset):
+            return frame[offset] | frame[offset + 1] << 8
+
+        cmd = frame[1]
+        if cmd == CMD_POSE:
+            for servo, offset in ((1, 3), (3, 5), (4, 7)):
+                if word(offset) != NO_CHANGE:
+                    self._set_servo_angle(servo, word(offset))
+            if frame[9] != 0xFF:
+                self._set_gripper(frame[9])
+        elif cmd == CMD_JOINT:
+            self._set_servo_angle(frame[3], word(4))
+        elif cmd == CMD_LINEAR:
+            self._set_linear(frame[3])
+        elif cmd == CMD_GRIPPER:
+            self._set_gripper(frame[3])
+        self._print("K")
+
+    def _set_servo_angle(self, servo, angle):
+        max_angle = MAX_ANGLES.get(servo, 180)
+        if not 0 <= angle <= max_angle:
+            self.clamped += 1
+        angle = max(0, min(max_angle, angle))
+        pulse = arduino_map(angle, 0, max_angle, MIN_PULSE, MAX_PULSE)
+        if self._echo_details:
+            self._print(f"Servo {servo}, Angle: {angle}, Pulse: {pulse}")
+        # Like the sketch's switch, only servos 1, 3 and 4 drive a channel
+        if servo in self.joints:
+            self.pulses[CHANNELS[servo]] = pulse
+            self.joints[servo].command(angle, self._clock)
+
+    def _set_linear(self, direction):
+        self._z = self._z_at(self._clock)
+        self._z_since = self._clock
+        self.linear = direction
+        if direction == 1:
+            self.pulses[CHANNELS[2]] = 500
+            if self._echo_details:
+                self._print("Servo 2 Up, Pulse: 500")
+        elif direction == 2:
+            self.pulses[CHANNELS[2]] = 200
+            if self._echo_details:
+                self._print("Servo 2 Down, Pulse: MIN_PULSE")
+        else:
+            self.pulses[CHANNELS[2]] = 0
+            if self._echo_details:
+                self._print(f"Servo 2 Stop, Pulse: {arduino_map(90, 0, 180, MIN_PULSE, MAX_PULSE)}")
+
+    def _set_gripper(self, state):
+        if self._echo_details:
+            self._print(f"Gripper State: {state}")
+        self.gripper = 1 if state == 1 else 0
+        self.pulses[CHANNELS["gripper"]] = 380 if state == 1 else 180
+        if self._echo_details:
+            self._print("Gripper Hold, Pulse: MAX_PULSE" if state == 1 else "Gripper Release, Pulse: MIN_PULSE")
+
+    def _z_at(self, now):
+        # The actuator has no feedback; height is dead-reckoned like Robot.move_to does
+        direction = {0: 0, 1: 1, 2: -1}[self.linear]
+        return max(0.0, min(self.z_max, self._z + direction * self.linear_speed * (now - self._z_since)))
+
+    def state(self, now=None):
+        # What the arm is doing at `now` (default: the current simulated time)
+        now = max(self.now(), self._clock) if now is None else now
+        return {
+            "time": round(now, 4),
+            "joints": {f"s{servo}": {"target": joint.target, "position": round(joint.position(now), 2)}
+                       for servo, joint in self.joints.items()},
+            "z": round(self._z_at(now), 2),
+            "gripper": "hold" if self.gripper else "release",
+            "pulses": dict(self.pulses),
+        }
+
+    def stats(self):
+        return {
+            "commands": self.commands,
+            "frames": self.frames,
+            "overruns": self.overruns,
+            "clamped": self.clamped,
+            "naks": self.naks,
+            "max_rx_fill": self.max_rx_fill,
+            "busy_seconds": round(self.busy, 4),
+            "pending_bytes": len(self._incoming),
+        }
+
+
+def main(argv=None):
+    # Drives a Robot through the simulator and reports the final joint states and the measured timing
+    parser = argparse.ArgumentParser(description="Exercise the command path against a simulated arm.")
+    parser.add_argument("--baud", type=int, default=9600)
+    parser.add_argument("--speed", type=float, default=1.0, help="time scale, 0 = as fast as possible")
+    parser.add_argument("--count", type=int, default=200, help="servo targets to post")
+    parser.add_argument("--rate", type=float, default=50.0, help="targets posted per second")
+    parser.add_argument("--ack-window", type=int, default=64, help="bytes in flight, 0 to pace on baud rate only")
+    parser.add_argument("--binary", action="store_true", help="use the binary frame protocol")
+    parser.add_argument("--quiet-firmware", action="store_true", help="simulate VERBOSE 0")
+    args = parser.parse_args(argv)
+
+    arm = SimulatedArm(args.baud, args.speed, verbose=not args.quiet_firmware)
+    robot = Robot("sim", tempfile.mkdtemp(), ArmGeometry(), args.baud, binary=args.binary,
+                  ack_window=args.ack_window or None).start(arm)
+    arm._sleep_until(1.5)  # Let the board boot, as init_serial waits for the banner
+    started = time.monotonic()
+    period = 1.0 / (args.rate * (args.speed or 1.0)) if args.speed else 0.0
+    expected = {}
+    for i in range(args.count):
+        servo = (1, 3, 4)[i % 3]
+        expected[servo] = (i * 7) % 181
+        robot.post(servo, expected[servo], "sim")
+        if period:
+            time.sleep(period)
+    # Wait for the host queues to drain and the firmware to catch up
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline and (robot.mailbox.pending_count() or robot.writer.queue.qsize()
+                                           or arm._incoming or (robot.acks and robot.acks.in_flight)):
+        time.sleep(0.01)
+    elapsed = time.monotonic() - started
+    final = arm.state(arm.now() + 2.0)  # after every joint has finished slewing
+    targets = {f"s{servo}": int(position / 180 * MAX_ANGLES[servo]) for servo, position in expected.items()}
+    report = {
+        "elapsed_seconds": round(elapsed, 3),
+        "simulated_seconds": round(arm.now(), 3),
+        "host": {"sent": robot.writer.commands_sent, "bytes": robot.writer.bytes_sent, "dropped": robot.writer.dropped,
+                 "rtt_ms": round(robot.acks.last_rtt * 1000, 1) if robot.acks and robot.acks.last_rtt else None},
+        "firmware": arm.stats(),
+        "final": final,
+        "reached_targets": all(final["joints"][name]["target"] == angle for name, angle in targets.items()),
+    }
+    print(json.dumps(report, indent=2))
+    robot.close()
+
+
+if __name__ == "__main__":
+    main()
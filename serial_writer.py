@@ -0,0 +1,301 @@
+import os
+import pty
+import threading
+import time
+import tty
+from collections import deque
+from queue import Queue, Full
+
+
+class SerialTransport:
+    def __init__(self, port, baudrate=9600, timeout=1):
+        import serial
+        self.baudrate = baudrate
+        self.port = serial.Serial(port, baudrate, timeout=timeout)
+
+    def write(self, data):
+        self.port.write(data)
+
+    def readline(self):
+        return self.port.readline()
+
+    def close(self):
+        self.port.close()
+
+
+class PtyTransport:
+    # The slave end (slave_name) can be opened by a simulator, `cat` or pyserial
+    def __init__(self, baudrate=9600):
+        self.baudrate = baudrate
+        self.master_fd, self.slave_fd = pty.openpty()
+        tty.setraw(self.slave_fd)
+        self.slave_name = os.ttyname(self.slave_fd)
+        self._buffer = b""
+
+    def write(self, data):
+        os.write(self.master_fd, data)
+
+    def readline(self):
+        while b"\n" not in self._buffer:
+            try:
+                chunk = os.read(self.master_fd, 1024)
+            except OSError:
+                chunk = b""
+            if not chunk:
+                line, self._buffer = self._buffer, b""
+                return line
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line + b"\n"
+
+    def close(self):
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+
+class LoopbackTransport:
+    # In-memory stand-in: keeps everything written and replays whatever is fed back
+    def __init__(self, baudrate=9600, on_write=None):
+        self.baudrate = baudrate
+        self.on_write = on_write
+        self.written = bytearray()
+        self._incoming = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def write(self, data):
+        self.written += data
+        if self.on_write:
+            self.on_write(data)
+
+    def feed(self, data):
+        with self._cond:
+            self._incoming.extend(data.splitlines(keepends=True))
+            self._cond.notify_all()
+
+    def readline(self, timeout=1):
+        with self._cond:
+            if not self._incoming and not self._closed:
+                self._cond.wait(timeout)
+            if self._incoming:
+                return self._incoming.popleft()
+            return b""
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class AckWindow:
+    """Commands written but not yet answered by the firmware, oldest first.
+
+    The firmware answers every text command with a "Received: '<command>'" line and
+    every binary frame with K or E, in order. Writes wait while window_bytes are
+    unanswered, so the 64-byte receive buffer on the Arduino never overruns. If the
+    firmware stops answering, entries expire after timeout and after a few of those
+    the window stands aside until answers come back.
+    """
+
+    def __init__(self, window_bytes=64, timeout=2.0, on_rtt=None):
+        self.window_bytes = window_bytes
+        self.timeout = timeout
+        self.on_rtt = on_rtt
+        self.enabled = True
+        self.in_flight = 0
+        self.acked = 0
+        self.naks = 0
+        self.lost = 0
+        self.timeouts = 0
+        self.last_rtt = None
+        self._pending = deque()  # (echo text or None for a frame, bytes, sent at)
+        self._cond = threading.Condition()
+        self._consecutive_timeouts = 0
+
+    def wait_for_room(self, size):
+        with self._cond:
+            while self.enabled and self._pending and self.in_flight + size > self.window_bytes:
+                self._expire()
+                if self._pending and self.in_flight + size > self.window_bytes:
+                    self._cond.wait(max(0.001, self._pending[0][2] + self.timeout - time.monotonic()))
+
+    def sent(self, data):
+        # Text commands are matched on their echo, frames (starting with the sync byte) on K/E
+        echo = None if data[:1] == b"\xa5" else data.decode(errors="replace").strip()
+        with self._cond:
+            self._pending.append((echo, len(data), time.monotonic()))
+            self.in_flight += len(data)
+            self._expire()
+
+    def feed_line(self, line):
+        # Returns True if the line answered a command
+        if line.startswith("Received: '") and line.endswith("'"):
+            return self._answer(line[11:-1], True)
+        if line in ("K", "E"):
+            return self._answer(None, line == "K")
+        return False
+
+    def _answer(self, echo, ok):
+        now = time.monotonic()
+        with self._cond:
+            if not any(entry[0] == echo for entry in self._pending):
+                return False
+            # Replies come back in order; anything older without a matching reply was lost on the way
+            while self._pending[0][0] != echo:
+                self._pop()
+                self.lost += 1
+            _, _, sent_at = self._pop()
+            self._consecutive_timeouts = 0
+            if not self.enabled:
+                print("Firmware is answering again, flow control back on")
+                self.enabled = True
+            if ok:
+                self.acked += 1
+            else:
+                self.naks += 1
+            self.last_rtt = now - sent_at
+            self._cond.notify_all()
+        if self.on_rtt:
+            self.on_rtt(self.last_rtt)
+        return True
+
+    def _pop(self):
+        entry = self._pending.popleft()
+        self.in_flight -= entry[1]
+        return entry
+
+    def _expire(self):
+        deadline = time.monotonic() - self.timeout
+        while self._pending and self._pending[0][2] < deadline:
+            self._pop()
+            self.timeouts += 1
+            self._consecutive_timeouts += 1
+        if self.enabled and self._consecutive_timeouts >= 3:
+            print("Firmware is not answering commands, pacing on link speed only")
+            self.enabled = False
+            self._pending.clear()
+            self.in_flight = 0
+        self._cond.notify_all()
+
+
+class SerialReader:
+    """Reads firmware replies off the transport and feeds them to an AckWindow."""
+
+    def __init__(self, transport, window, on_line=None):
+        self.transport = transport
+        self.window = window
+        self.on_line = on_line
+        self.lines = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                raw = self.transport.readline()
+            except Exception as e:
+                if not self._stop.is_set():
+                    print(f"Serial read error: {e}")
+                break
+            if not raw:
+                continue
+            self.lines += 1
+            line = raw.decode(errors="replace").strip()
+            if not self.window.feed_line(line) and self.on_line:
+                # Anything that is not an answer, e.g. the Servo/Pulse detail lines
+                self.on_line(line)
+
+
+class SerialWriter:
+    """Owns the transport and writes queued commands paced to the link speed, or to firmware replies (AckWindow)."""
+
+    def __init__(self, transport=None, maxsize=256, buffer_bytes=64, command_time=0.0, put_timeout=0.5, baudrate=None,
+                 acks=None):
+        # The transport may be attached later in start(); commands queue up until then
+        self.transport = transport
+        self.queue = Queue(maxsize=maxsize)
+        # 8N1 framing: one start bit, eight data bits, one stop bit
+        self.byte_time = 10.0 / (baudrate or transport.baudrate)
+        # How far ahead of the wire we let writes run (the Arduino RX buffer is 64 bytes)
+        self.max_ahead = buffer_bytes * self.byte_time
+        self.command_time = command_time
+        self.put_timeout = put_timeout
+        self.acks = acks
+        self.on_write = None  # on_write(data, source, latency) after each successful write
+        self.commands_sent = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+        self._link_free_at = 0.0
+        self._thread = None
+
+    def start(self, transport=None):
+        if transport is not None:
+            self.transport = transport
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2):
+        try:
+            self.queue.put(None, timeout=timeout)
+        except Full:
+            pass
+        if self._thread:
+            self._thread.join(timeout)
+
+    def send(self, command, source=None, requested_at=None):
+        data = command if isinstance(command, bytes) else f"{command}\n".encode()
+        requested_at = time.monotonic() if requested_at is None else requested_at
+        try:
+            self.queue.put((data, source, requested_at), timeout=self.put_timeout)
+        except Full:
+            self.dropped += 1
+            print(f"Serial queue full, dropped: {command}")
+            return False
+        return True
+
+    def drain(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            data, source, requested_at = item
+            now = time.monotonic()
+            if self.acks and self.acks.enabled:
+                self.acks.wait_for_room(len(data))
+                now = time.monotonic()
+            else:
+                ahead = self._link_free_at - now
+                if ahead > self.max_ahead:
+                    time.sleep(ahead - self.max_ahead)
+                    now = time.monotonic()
+            try:
+                self.transport.write(data)
+            except Exception as e:
+                print(f"Serial write error: {e}")
+            else:
+                self.commands_sent += 1
+                self.bytes_sent += len(data)
+                if self.acks:
+                    self.acks.sent(data)
+                if self.on_write:
+                    self.on_write(data, source, time.monotonic() - requested_at)
+            self._link_free_at = max(now, self._link_free_at) + len(data) * self.byte_time + self.command_time
+            self.queue.task_done()
@@ -0,0 +1,88 @@
+import threading
+import time
+
+SERVO_RANGES = {1: 270, 3: 360, 4: 180}
+
+
+def servo_command(servo, position):
+    # Sliders run 0-180; the firmware expects the joint's own range
+    position = max(0, min(180, position))
+    return f"S{servo}{int(position / 180 * SERVO_RANGES[servo])}"
+
+
+class ServoMailbox:
+    """One slot per servo; a newer target overwrites the pending one."""
+
+    def __init__(self, servos=(1, 3, 4), rate=20.0):
+        self.period = 1.0 / rate
+        self._pending = {}
+        self._servos = set(servos)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._last_sent = {}
+        self._origins = {}
+        self.origins = {}  # {servo: (source, posted at)} for the batch last taken
+        self.posted = 0
+        self.coalesced = 0
+
+    def post(self, servo, position, source=None):
+        self.post_many({servo: position}, source)
+
+    def post_many(self, positions, source=None):
+        # Every target lands in the same flush, so the joints move together
+        unknown = set(positions) - self._servos
+        if unknown:
+            raise ValueError(f"Unknown servo: {', '.join(map(str, sorted(unknown)))}")
+        with self._cond:
+            now = time.monotonic()
+            for servo, position in positions.items():
+                self.posted += 1
+                if servo in self._pending:
+                    self.coalesced += 1
+                    posted_at = self._origins[servo][1]
+                else:
+                    posted_at = now
+                # Latency counts from the first post of a batch; the source is whoever posted last
+                self._origins[servo] = (source, posted_at)
+                self._pending[servo] = position
+            self._cond.notify()
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def take(self, timeout=None):
+        # Returns {servo: position} of everything pending, {} on timeout, None once closed
+        with self._cond:
+            if not self._pending and not self._closed:
+                self._cond.wait(timeout)
+            if self._closed and not self._pending:
+                return None
+            pending, self._pending = self._pending, {}
+            self.origins, self._origins = self._origins, {}
+            return pending
+
+    def reset(self):
+        # Forget what was last delivered, e.g. after something else moved the arm
+        self._last_sent = {}
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def run(self, deliver):
+        # Flushes at most once per control period; the last target posted is always delivered.
+        # deliver() gets {servo: position} for every target that changed since the last flush.
+        while True:
+            pending = self.take()
+            if pending is None:
+                break
+            flushed_at = time.monotonic()
+            last_sent = self._last_sent
+            changed = {servo: position for servo, position in pending.items() if last_sent.get(servo) != position}
+            if changed:
+                last_sent.update(changed)
+                deliver(changed)
+            delay = self.period - (time.monotonic() - flushed_at)
+            if delay > 0:
+                time.sleep(delay)
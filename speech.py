@@ -0,0 +1,154 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+HIGH = 0
+NORMAL = 1
+LOW = 2
+
+
+class SpeechQueue:
+    """Pending announcements, highest priority first; a newer message replaces a pending one with the same key."""
+
+    def __init__(self, maxsize=6):
+        self.maxsize = maxsize
+        self._items = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.superseded = 0
+        self.dropped = 0
+
+    def put(self, text, priority=NORMAL, key=None):
+        with self._cond:
+            if key is not None:
+                before = len(self._items)
+                self._items = [item for item in self._items if item[2] != key]
+                self.superseded += before - len(self._items)
+            self._seq += 1
+            self._items.append((priority, self._seq, key, text))
+            if len(self._items) > self.maxsize:
+                # Drop the least important, oldest message
+                self._items.remove(max(self._items, key=lambda item: (item[0], -item[1])))
+                self.dropped += 1
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        # Returns the next text, "" on timeout, or None once closed
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None if self._closed else ""
+            item = min(self._items)
+            self._items.remove(item)
+            return item[3]
+
+    def qsize(self):
+        return len(self._items)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+def find_player():
+    # Returns a function that plays a wav file and waits for it, or None
+    if sys.platform == "win32":
+        import winsound
+        return lambda path: winsound.PlaySound(path, winsound.SND_FILENAME)
+    try:
+        import simpleaudio
+        return lambda path: simpleaudio.WaveObject.from_wave_file(path).play().wait_done()
+    except ImportError:
+        pass
+    for command in (["aplay", "-q"], ["paplay"], ["afplay"]):
+        if shutil.which(command[0]):
+            return lambda path, command=command: subprocess.run(command + [path], check=False)
+    return None
+
+
+class PhraseCache:
+    """Fixed phrases rendered to wav once and replayed without synthesis."""
+
+    def __init__(self, engine, directory, phrases=()):
+        self.engine = engine
+        self.directory = directory
+        self.pending = list(phrases)
+        self.rendered = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, text):
+        # The voice rate is part of the key so a rate change re-renders everything
+        digest = hashlib.sha1(f"{self.engine.getProperty('rate')}:{text}".encode()).hexdigest()[:16]
+        return os.path.join(self.directory, f"{digest}.wav")
+
+    def lookup(self, text):
+        path = self.rendered.get(text)
+        if path is None:
+            path = self.path(text)
+            if os.path.exists(path):
+                self.rendered[text] = path
+            else:
+                return None
+        return path
+
+    def render_next(self):
+        # Renders one pending phrase; returns False when there is nothing left to do
+        while self.pending:
+            text = self.pending.pop(0)
+            if self.lookup(text):
+                continue
+            path = self.path(text)
+            self.engine.save_to_file(text, path)
+            self.engine.runAndWait()
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                self.rendered[text] = path
+            return True
+        return False
+
+
+class Speaker:
+    """Owns the pyttsx3 engine; cached phrases are played back, anything else is synthesised."""
+
+    def __init__(self, engine, queue, cache=None, player=None):
+        self.engine = engine
+        self.queue = queue
+        self.cache = cache
+        self.player = player if player is not None else find_player()
+        self.spoken = 0
+        self.from_cache = 0
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def run(self):
+        while True:
+            # Phrases are pre-rendered only while there is nothing to say
+            idle = self.cache is not None and self.player is not None and bool(self.cache.pending)
+            text = self.queue.get(timeout=0.1 if idle else None)
+            if text is None:
+                break
+            if text == "":
+                if idle:
+                    self.cache.render_next()
+                continue
+            self.say(text)
+
+    def say(self, text):
+        path = self.cache.lookup(text) if self.cache is not None and self.player is not None else None
+        try:
+            if path:
+                self.player(path)
+                self.from_cache += 1
+            else:
+                self.engine.say(text)
+                self.engine.runAndWait()
+        except Exception as e:
+            print(f"Speech error: {e}")
+        self.spoken += 1
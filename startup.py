@@ -0,0 +1,71 @@
+import threading
+import time
+
+
+class StartupStep:
+    def __init__(self, name, fn, weight):
+        self.name = name
+        self.fn = fn
+        self.weight = weight
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.seconds = None
+
+
+class Startup:
+    """Runs independent initialisation steps concurrently and reports real progress."""
+
+    def __init__(self):
+        self.steps = {}
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def step(self, name, fn, weight=1.0):
+        self.steps[name] = StartupStep(name, fn, weight)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        for step in self.steps.values():
+            threading.Thread(target=self._run, args=(step,), name=f"startup-{step.name}", daemon=True).start()
+        return self
+
+    def _run(self, step):
+        started = time.perf_counter()
+        try:
+            step.result = step.fn()
+        except Exception as e:
+            step.error = e
+            print(f"Startup step {step.name} failed: {e}")
+        step.seconds = time.perf_counter() - started
+        with self._lock:
+            step.done.set()
+            if self.done and self.finished_at is None:
+                self.finished_at = time.perf_counter()
+
+    def wait(self, name, timeout=None):
+        # Returns the step's result, or None if it failed or is still running after timeout
+        step = self.steps[name]
+        step.done.wait(timeout)
+        return step.result
+
+    def progress(self):
+        total = sum(step.weight for step in self.steps.values())
+        finished = sum(step.weight for step in self.steps.values() if step.done.is_set())
+        return finished / total if total else 1.0
+
+    @property
+    def done(self):
+        return all(step.done.is_set() for step in self.steps.values())
+
+    def timings(self):
+        timings = {name: step.seconds for name, step in self.steps.items() if step.seconds is not None}
+        if self.finished_at is not None:
+            timings["total"] = self.finished_at - self.started_at
+        return timings
+
+    def report(self):
+        parts = [f"{name} {seconds:.2f}s" for name, seconds in self.timings().items()]
+        failed = [name for name, step in self.steps.items() if step.error is not None]
+        return "Startup: " + ", ".join(parts) + (f" (failed: {', '.join(failed)})" if failed else "")
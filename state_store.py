@@ -0,0 +1,82 @@
+import threading
+from collections import deque
+
+_MISSING = object()
+
+
+class StateStore:
+    """Versioned key/value state shared by several threads.
+
+    update() and modify() apply their values atomically and bump the version only when
+    something actually changed. Subscribers get (version, changes) with just the keys
+    that changed, in version order. They are called after the store's lock is released,
+    normally on the updating thread; if another thread is already delivering, that
+    thread delivers this change too and update() returns without waiting for it.
+    """
+
+    def __init__(self, **initial):
+        self.version = 0
+        self._state = dict(initial)
+        self._subscribers = []
+        self._lock = threading.RLock()
+        self._outbox = deque()  # (version, changes, subscriber or None for all) still to deliver
+        self._delivering = False
+
+    def get(self, key, default=None):
+        # The dict is replaced, never mutated, so a plain read needs no lock
+        return self._state.get(key, default)
+
+    def snapshot(self):
+        with self._lock:
+            return self.version, dict(self._state)
+
+    def update(self, **values):
+        return self.modify(lambda state: values)
+
+    def modify(self, fn):
+        # fn(state) returns the new values; it runs under the lock, so read-modify-write is atomic
+        with self._lock:
+            changes = {key: value for key, value in fn(dict(self._state)).items()
+                       if self._state.get(key, _MISSING) != value}
+            if not changes:
+                return changes
+            state = dict(self._state)
+            state.update(changes)
+            self._state = state
+            self.version += 1
+            self._outbox.append((self.version, changes, None))
+        self._deliver()
+        return changes
+
+    def subscribe(self, callback, keys=None, initial=False):
+        # With initial=True the callback first gets the current values, so it starts in sync
+        entry = (None if keys is None else tuple(keys), callback)
+        with self._lock:
+            self._subscribers.append(entry)
+            if initial:
+                self._outbox.append((self.version, dict(self._state), entry))
+        self._deliver()
+
+        def unsubscribe():
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+        return unsubscribe
+
+    def _deliver(self):
+        # One thread delivers at a time, so callbacks see changes in version order without holding the lock
+        while True:
+            with self._lock:
+                if self._delivering or not self._outbox:
+                    return
+                self._delivering = True
+                version, changes, target = self._outbox.popleft()
+                subscribers = list(self._subscribers) if target is None else [target]
+            try:
+                for keys, callback in subscribers:
+                    selected = changes if keys is None else {key: changes[key] for key in keys if key in changes}
+                    if selected:
+                        callback(version, selected)
+            finally:
+                with self._lock:
+                    self._delivering = False
@@ -0,0 +1,173 @@
+import asyncio
+import inspect
+import threading
+
+
+class ControlClient:
+    def __init__(self, server, writer, send_queue_size):
+        self.server = server
+        self.writer = writer
+        self.addr = writer.get_extra_info("peername")
+        self.outgoing = asyncio.Queue(maxsize=send_queue_size)
+        self.dropped = 0
+
+    def send(self, text):
+        # Safe from any thread; never blocks the caller
+        self.server.loop.call_soon_threadsafe(self._enqueue, text)
+
+    def congested(self):
+        # Messages still queued here, or bytes the socket has not taken yet
+        return not self.outgoing.empty() or self.writer.transport.get_write_buffer_size() > 0
+
+    def _enqueue(self, text):
+        if self.outgoing.full():
+            # A slow client loses its oldest pending messages rather than stalling anyone
+            self.outgoing.get_nowait()
+            self.dropped += 1
+        self.outgoing.put_nowait(text)
+
+    async def pump(self):
+        while True:
+            text = await self.outgoing.get()
+            if text is None:
+                break
+            self.writer.write(text.encode() if text.endswith("\n") else f"{text}\n".encode())
+            await self.writer.drain()
+
+
+class ControlServer:
+    """Newline-framed command server; handlers are looked up in a table.
+
+    A payload command is followed by a raw body: "upload 2048 json" then 2048 bytes.
+    Handlers run on the event loop; one with slow work returns an awaitable (a coroutine,
+    or loop.run_in_executor(...)) and its reply is sent when that finishes.
+    """
+
+    def __init__(self, host="0.0.0.0", port=12345, max_line=4096, send_queue_size=64, max_payload=4 << 20):
+        self.host = host
+        self.port = port
+        self.max_line = max_line
+        self.send_queue_size = send_queue_size
+        self.max_payload = max_payload
+        self.commands = {}
+        self.prefix_commands = []
+        self.payload_commands = {}
+        self.clients = set()
+        self.loop = None
+        self._server = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    def command(self, name, handler):
+        # "play" matches "play 2 5" and calls handler(client, "2 5")
+        self.commands[name] = handler
+
+    def prefix_command(self, prefix, handler):
+        # "s1" matches "s1135" and calls handler(client, "135")
+        self.prefix_commands.append((prefix, handler))
+
+    def payload_command(self, name, handler):
+        # "upload 2048 json" reads the next 2048 bytes and calls handler(client, "json", body)
+        self.payload_commands[name] = handler
+
+    def dispatch(self, client, line):
+        handler = self.commands.get(line)
+        if handler:
+            return handler(client, "")
+        verb, _, arg = line.partition(" ")
+        handler = self.commands.get(verb)
+        if handler:
+            return handler(client, arg.strip())
+        for prefix, handler in self.prefix_commands:
+            if line.startswith(prefix):
+                return handler(client, line[len(prefix):])
+        return "Invalid command"
+
+    def broadcast(self, text):
+        for client in list(self.clients):
+            client.send(text)
+
+    def start(self):
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._serve()), daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self.loop and self._server:
+            self.loop.call_soon_threadsafe(self._server.close)
+        if self._thread:
+            self._thread.join(2)
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port, limit=self.max_line)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"TCP Server listening on port {self.port}...")
+        self._ready.set()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+
+    async def _dispatch_payload(self, client, reader, verb, arg):
+        size, _, arg = arg.partition(" ")
+        if not size.isdigit():
+            raise ValueError(f"Usage: {verb} <bytes> ...")
+        size = int(size)
+        if size > self.max_payload:
+            # Skip the body so the next line is still read as a command
+            while size > 0:
+                chunk = await reader.read(min(size, 65536))
+                if not chunk:
+                    raise ConnectionError("connection closed during payload")
+                size -= len(chunk)
+            raise ValueError(f"Payload larger than {self.max_payload} bytes")
+        payload = await reader.readexactly(size)
+        return self.payload_commands[verb](client, arg.strip(), payload)
+
+    async def _handle_client(self, reader, writer):
+        # Replies are queued directly since this runs on the loop; send() would schedule them
+        # behind the close sentinel when the client hangs up straight after a command
+        client = ControlClient(self, writer, self.send_queue_size)
+        self.clients.add(client)
+        pump = asyncio.create_task(client.pump())
+        print(f"Connected to client: {client.addr}")
+        try:
+            while True:
+                try:
+                    raw = await reader.readline()
+                except ValueError:
+                    client._enqueue("Error: command too long")
+                    break
+                if not raw:
+                    break
+                line = raw.decode(errors="replace").strip().lower()
+                if not line:
+                    continue
+                print(f"Received: '{line}'")
+                try:
+                    verb, _, arg = line.partition(" ")
+                    if verb in self.payload_commands:
+                        reply = await self._dispatch_payload(client, reader, verb, arg)
+                    else:
+                        reply = self.dispatch(client, line)
+                    if inspect.isawaitable(reply):
+                        reply = await reply
+                except Exception as e:
+                    print(f"Error: {e}")
+                    reply = f"Error: {e}"
+                if reply:
+                    client._enqueue(reply)
+        except (ConnectionError, OSError) as e:
+            print(f"TCP Client error: {e}")
+        finally:
+            self.clients.discard(client)
+            client._enqueue(None)
+            try:
+                await asyncio.wait_for(pump, 1)
+            except (asyncio.TimeoutError, ConnectionError, OSError):
+                pump.cancel()
+            writer.close()
+            print(f"Disconnected from client: {client.addr}")
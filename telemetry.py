@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+DEFAULT_RATE = 10.0
+MAX_RATE = 50.0
+
+
+class Telemetry:
+    """Streams state to subscribed ControlServer clients at a rate each client picks.
+
+    Topics are sampled when a client is due an update rather than queued as they change,
+    so a client only ever gets the latest values, and a tick is skipped while that
+    client still has unsent data. Nothing here runs on the threads driving the arms.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.sources = {}
+        self.streams = {}
+        self.sent = 0
+        self.skipped = 0
+
+    def source(self, topic, fn):
+        # fn() returns the topic's current value; it must be JSON-serialisable and cheap
+        self.sources[topic] = fn
+
+    def subscribe(self, client, topics=None, rate=DEFAULT_RATE):
+        # Called on the server's event loop, from a command handler
+        topics = list(self.sources) if not topics else topics
+        unknown = [topic for topic in topics if topic not in self.sources]
+        if unknown:
+            raise ValueError(f"Unknown topic {', '.join(unknown)} (topics: {', '.join(self.sources)})")
+        if not 0 < rate <= MAX_RATE:
+            raise ValueError(f"Rate must be above 0 and at most {MAX_RATE:g} Hz")
+        self.unsubscribe(client)
+        self.streams[client] = asyncio.get_running_loop().create_task(self._stream(client, topics, 1.0 / rate))
+        return f"Subscribed to {', '.join(topics)} at {rate:g} Hz"
+
+    def unsubscribe(self, client):
+        stream = self.streams.pop(client, None)
+        if stream:
+            stream.cancel()
+        return "Unsubscribed"
+
+    async def _stream(self, client, topics, period):
+        last = {}
+        try:
+            while client in self.server.clients:
+                if client.congested():
+                    self.skipped += 1
+                else:
+                    changes = {}
+                    for topic in topics:
+                        value = self.sources[topic]()
+                        if last.get(topic) != value:
+                            changes[topic] = value
+                    if changes:
+                        last.update(changes)
+                        client.send("telemetry " + json.dumps(changes, separators=(",", ":")))
+                        self.sent += 1
+                await asyncio.sleep(period)
+        finally:
+            if self.streams.get(client) is asyncio.current_task():
+                del self.streams[client]
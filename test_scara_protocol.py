@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from scara_protocol import (CMD_GRIPPER, CMD_JOINT, CMD_LINEAR, CMD_POSE, NO_CHANGE, SYNC, FrameDecoder,
+                            encode_command, encode_frame, encode_pose, frame_to_commands)
+
+FRAMES = [
+    (CMD_POSE, (135, 180, 90, 1)),
+    (CMD_POSE, (NO_CHANGE, 0, NO_CHANGE, 0xFF)),
+    (CMD_JOINT, (3, 360)),
+    (CMD_LINEAR, (2,)),
+    (CMD_GRIPPER, (0,)),
+]
+
+
+def decode_bytewise(stream):
+    decoder = FrameDecoder()
+    frames = [frame for i in range(len(stream)) for frame in decoder.feed(stream[i:i + 1])]
+    return frames, decoder
+
+
+@pytest.mark.parametrize("cmd, fields", FRAMES)
+def test_round_trip(cmd, fields):
+    decoder = FrameDecoder()
+    assert decoder.feed(encode_frame(cmd, *fields)) == [(cmd, fields)]
+    assert decoder.errors == 0
+    assert not decoder.buffer
+
+
+def test_pose_commands():
+    assert frame_to_commands(CMD_POSE, (135, 180, 90, 1)) == ["S1135", "S3180", "S490", "G1"]
+    assert frame_to_commands(CMD_POSE, (NO_CHANGE, 0, NO_CHANGE, 0xFF)) == ["S30"]
+
+
+def test_one_byte_at_a_time():
+    rng = random.Random(1)
+    poses = [(rng.randint(0, 270), rng.randint(0, 360), rng.randint(0, 180), rng.randint(0, 1)) for _ in range(1000)]
+    frames, decoder = decode_bytewise(b"".join(encode_pose(*pose) for pose in poses))
+    assert [fields for _, fields in frames] == poses
+    assert decoder.errors == 0
+
+
+def test_resync_after_bad_checksum():
+    # 165 is the SYNC byte, so the broken frame's payload offers a false start too
+    bad = bytearray(encode_pose(SYNC, SYNC, 90, 1))
+    bad[-1] ^= 0xFF
+    frames, decoder = decode_bytewise(encode_pose(10, 20, 30, 0) + bytes(bad) + encode_pose(40, 50, 60, 1))
+    assert [fields for _, fields in frames] == [(10, 20, 30, 0), (40, 50, 60, 1)]
+    assert decoder.errors > 0
+
+
+def test_resync_after_bad_length():
+    bad = bytearray(encode_frame(CMD_JOINT, 1, 90))
+    bad[2] = 9
+    frames, decoder = decode_bytewise(bytes(bad) + encode_frame(CMD_JOINT, 4, 45))
+    assert frames == [(CMD_JOINT, (4, 45))]
+    assert decoder.errors > 0
+
+
+def test_noise_between_frames():
+    stream = b"\x00garbage\n" + encode_frame(CMD_LINEAR, 1) + b"K\nE\n" + encode_frame(CMD_GRIPPER, 1)
+    frames, _ = decode_bytewise(stream)
+    assert frames == [(CMD_LINEAR, (1,)), (CMD_GRIPPER, (1,))]
+
+
+@pytest.mark.parametrize("command", ["S1135", "S10", "S3360", "S4180", "S2up", "S2down", "S2stop", "G1", "G0"])
+def test_encode_command(command):
+    frames = FrameDecoder().feed(encode_command(command))
+    assert [frame_to_commands(*frame) for frame in frames] == [[command]]
+
+
+def test_encode_command_rejects_unknown():
+    with pytest.raises(ValueError):
+        encode_command("X1")
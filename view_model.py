@@ -0,0 +1,103 @@
+import threading
+import time
+import tkinter as tk
+
+_MISSING = object()
+
+
+class ViewModel:
+    """The value each widget shows, and the changes not yet applied to it.
+
+    set() is safe from any thread and drops values the widget already shows or is about
+    to. Pending changes are applied on the Tk main thread in one batch per display tick;
+    the first change after a batch wakes the main thread with a virtual event, so nothing
+    polls while the view is idle. From a worker thread that wakeup waits for the main
+    thread, so set() must not be called while holding a lock the main thread may take
+    (state store subscribers are called with no lock held).
+    """
+
+    def __init__(self, fps=30, event="<<ViewChanged>>"):
+        self.period = 1.0 / fps
+        self.event = event
+        self.root = None
+        self._bindings = {}
+        self._shown = {}
+        self._pending = {}
+        self._scheduled = False
+        self._next_flush = 0.0
+        self._lock = threading.Lock()
+        self.applied = 0
+        self.suppressed = 0
+        self.flushes = 0
+
+    def bind(self, key, apply):
+        # apply(value) runs on the main thread whenever the value for key changes
+        self._bindings[key] = apply
+
+    def attach(self, root):
+        # Changes made before the widgets exist are kept and applied on the first tick
+        root.bind(self.event, self._wake)
+        with self._lock:
+            self.root = root
+            self._scheduled = bool(self._pending)
+        if self._scheduled:
+            self._notify()
+
+    def set(self, key, value):
+        with self._lock:
+            if self._pending.get(key, self._shown.get(key, _MISSING)) == value:
+                self.suppressed += 1
+                return
+            if self._shown.get(key, _MISSING) == value:
+                # Changed back before it was drawn
+                del self._pending[key]
+                self.suppressed += 1
+                return
+            self._pending[key] = value
+            wake = self.root is not None and not self._scheduled
+            self._scheduled = self._scheduled or wake
+        if wake:
+            self._notify()
+
+    def update(self, changes):
+        for key, value in changes.items():
+            self.set(key, value)
+
+    def note(self, key, value):
+        # The widget was changed directly (the user dragged a slider); keep the cache truthful
+        with self._lock:
+            self._shown[key] = value
+            self._pending.pop(key, None)
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def _notify(self):
+        try:
+            self.root.event_generate(self.event, when="tail")
+        except (RuntimeError, tk.TclError):
+            # Tk without thread support, or the window is already gone; try again on the next change
+            with self._lock:
+                self._scheduled = False
+
+    def _wake(self, event=None):
+        # Runs on the main thread; waits for the next tick so a burst of changes becomes one batch
+        delay = self._next_flush - time.monotonic()
+        self.root.after(max(0, int(delay * 1000)), self._flush)
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._shown.update(pending)
+            self._scheduled = False
+        self._next_flush = time.monotonic() + self.period
+        self.flushes += 1
+        for key, value in pending.items():
+            apply = self._bindings.get(key)
+            if apply is None:
+                continue
+            try:
+                apply(value)
+                self.applied += 1
+            except Exception as e:
+                print(f"View update {key} failed: {e}")
@@ -0,0 +1,67 @@
+import json
+import math
+import struct
+
+from servo_mailbox import servo_command
+
+# Binary uploads are packed rows of little-endian float32: seconds from the start, then the
+# servo 1, 3 and 4 slider positions (0-180). NaN leaves a joint where it is for that row.
+WAYPOINT = struct.Struct("<4f")
+JOINTS = (1, 3, 4)
+MAX_WAYPOINTS = 100000
+MAX_DURATION = 3600.0  # Seconds; compiled trajectories grow with duration, not with the number of rows
+
+
+def parse_waypoints(payload, fmt="json"):
+    """Waypoints from an upload body as [(seconds, s1, s3, s4, gripper)], in time order.
+
+    JSON is a list of [t, s1, s3, s4] rows with an optional fifth "hold"/"release";
+    null skips a joint (or the gripper) for that row.
+    """
+    if fmt in ("bin", "binary"):
+        if len(payload) % WAYPOINT.size:
+            raise ValueError(f"Binary waypoints must be {WAYPOINT.size}-byte rows")
+        rows = [tuple(None if math.isnan(value) else value for value in row) + (None,)
+                for row in WAYPOINT.iter_unpack(payload)]
+    elif fmt == "json":
+        rows = [_json_row(row) for row in json.loads(payload)]
+    else:
+        raise ValueError(f"Unknown waypoint format: {fmt} (use json or bin)")
+    if not rows:
+        raise ValueError("No waypoints")
+    if len(rows) > MAX_WAYPOINTS:
+        raise ValueError(f"At most {MAX_WAYPOINTS} waypoints")
+    previous = 0.0
+    for row in rows:
+        if any(value is not None and not math.isfinite(value) for value in row[:4]):
+            raise ValueError("Waypoint values must be finite")
+        if row[0] is None or row[0] < previous:
+            raise ValueError("Waypoint times must start at 0 or later and never go backwards")
+        previous = row[0]
+    if previous > MAX_DURATION:
+        raise ValueError(f"Waypoints may span at most {MAX_DURATION:g} seconds")
+    return rows
+
+
+def _json_row(row):
+    if not isinstance(row, list) or len(row) not in (4, 5):
+        raise ValueError("Each waypoint is [t, s1, s3, s4] or [t, s1, s3, s4, gripper]")
+    values = [None if value is None else float(value) for value in row[:4]]
+    gripper = row[4] if len(row) == 5 else None
+    if gripper not in (None, "hold", "release"):
+        raise ValueError(f"Gripper must be hold or release, not {gripper!r}")
+    return tuple(values) + (gripper,)
+
+
+def waypoints_to_recording(waypoints):
+    # The (timestamp, command) form Trajectory.compile takes, with the firmware's joint ranges
+    recording = []
+    gripper = None
+    for t, *positions, grip in waypoints:
+        for servo, position in zip(JOINTS, positions):
+            if position is not None:
+                recording.append((t, servo_command(servo, position)))
+        if grip is not None and grip != gripper:
+            recording.append((t, "G1" if grip == "hold" else "G0"))
+            gripper = grip
+    return recording